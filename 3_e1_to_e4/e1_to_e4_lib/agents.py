@@ -1,8 +1,10 @@
 from pydantic_ai import Agent
 from pydantic_ai.models.openrouter import OpenRouterModel
 from pydantic_ai.providers.openrouter import OpenRouterProvider
+from pydantic_ai.settings import ModelSettings
 
-from .models import E1Response, E2Response, E3Response, E4Response
+from .constants import E4_MAX_TOKENS
+from .models import AnswerResponse, E4Response
 
 
 def create_openrouter_model(model_name: str, api_key: str) -> OpenRouterModel:
@@ -16,18 +18,18 @@ def create_openrouter_model(model_name: str, api_key: str) -> OpenRouterModel:
     return OpenRouterModel(model_name, provider=provider)
 
 
-def create_e1_agent(model: OpenRouterModel) -> Agent[None, E1Response]:
+def create_e1_agent(model: OpenRouterModel) -> Agent[None, AnswerResponse]:
     """Create a baseline agent for E1 experiment with minimal system prompt."""
     agent = Agent(
         model,
-        output_type=E1Response,
+        output_type=AnswerResponse,
         system_prompt="You are a retail customer support assistant. Answer the question concisely. If you are unsure or don't have information to answer accurately, say 'I don't know'.",
         retries=2,
     )
     return agent
 
 
-def create_e2_agent(model: OpenRouterModel) -> Agent[None, E2Response]:
+def create_e2_agent(model: OpenRouterModel) -> Agent[None, AnswerResponse]:
     """Create E2 Standard RAG agent."""
     system_prompt = """You are a retail customer support assistant.
 Use the provided context to answer the user's question accurately.
@@ -42,14 +44,14 @@ Context will be provided in the user message."""
 
     agent = Agent(
         model,
-        output_type=E2Response,
+        output_type=AnswerResponse,
         system_prompt=system_prompt,
         retries=5,
     )
     return agent
 
 
-def create_e3_agent(model: OpenRouterModel) -> Agent[None, E3Response]:
+def create_e3_agent(model: OpenRouterModel) -> Agent[None, AnswerResponse]:
     """Create E3 Filtered RAG agent."""
     system_prompt = """You are a retail customer support assistant.
 Use the provided context to answer the user's question accurately.
@@ -65,7 +67,7 @@ Context will be provided in the user message."""
 
     agent = Agent(
         model,
-        output_type=E3Response,
+        output_type=AnswerResponse,
         system_prompt=system_prompt,
         retries=5,
     )
@@ -96,5 +98,6 @@ Context will be provided in the user message."""
         output_type=E4Response,
         system_prompt=system_prompt,
         retries=5,
+        model_settings=ModelSettings(max_tokens=E4_MAX_TOKENS),
     )
     return agent
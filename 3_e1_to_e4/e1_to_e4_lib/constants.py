@@ -14,9 +14,22 @@ DEFAULT_OVERWRITE = "false"
 
 # Model configurations
 OPENROUTER_MODEL = "meta-llama/llama-3.1-8b-instruct"
+EMBEDDING_BACKEND = "openai"  # or "fastembed" for local iteration (not benchmarks)
 EMBEDDING_MODEL = "text-embedding-3-small"
 EMBEDDING_DIM = 1536  # dimension for text-embedding-3-small
+FASTEMBED_MODEL = "BAAI/bge-small-en-v1.5"
+FASTEMBED_DIM = 384  # dimension for bge-small-en-v1.5
+FASTEMBED_BATCH_SIZE = 256
+EMBEDDING_CACHE_DTYPE = "float16"  # on-disk precision of cached embeddings (or "int8")
 RERANKER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+# Cross-encoder runtime: "torch" (FP32), or "onnx" to run the ONNX export named
+# by RERANKER_ONNX_FILE (needs sentence-transformers[onnx]). The int8 export is
+# several times faster on CPU but scores differ slightly from the FP32 model.
+RERANKER_BACKEND = "torch"
+RERANKER_ONNX_FILE = "onnx/model_quint8_avx2.onnx"
+# Output token ceiling for E4 CoT responses; well above normal answers, it only
+# stops runaway generations from dominating the run time
+E4_MAX_TOKENS = 2048
 
 # Retrieval parameters
 E2_TOP_K = 5  # E2 - Standard RAG
@@ -25,9 +38,19 @@ E3_TOP_K = 5  # E3 - After reranking
 E4_TOP_N = 20  # E4 - Initial vector search retrieval
 E4_TOP_K = 5  # E4 - After reranking
 
+# Embedding batch size for the up-front query embedding pass
+QUERY_EMBED_BATCH_SIZE = 256
+# (query, chunk) pairs per cross-encoder forward pass
+RERANK_BATCH_SIZE = 64
+
 # Qdrant configuration
 QDRANT_COLLECTION = "retail_kb"
-QDRANT_IN_MEMORY = True
+QDRANT_STORAGE_FOLDER = "qdrant_storage"  # Under KB_DIR
+QDRANT_ON_DISK = True  # Persist the collection instead of keeping it in memory
+QDRANT_INDEXING_THRESHOLD = 20000  # Restored after the bulk upload finishes
+# Vector quantization: "scalar" (INT8), "binary" or None. Applied by Qdrant
+# servers; local mode always runs exact search on the original vectors.
+QDRANT_QUANTIZATION = "scalar"
 
 # Chunking parameters
 CHUNK_SIZE = 512
@@ -35,3 +58,7 @@ CHUNK_OVERLAP = 128
 
 # Rate limiting (OpenRouter: 20 requests per minute)
 REQUEST_DELAY_SECONDS = 3.0
+# Requests that may run back-to-back before pacing kicks in. The bucket starts
+# full, so any value above 1 exceeds 20 requests in the first minute of a run.
+RATE_LIMIT_BURST = 1
+MAX_CONCURRENT_LLM_CALLS = 4  # In-flight LLM requests for concurrent pipelines
@@ -1,35 +1,98 @@
 """Embedding service using OpenAI API with caching support."""
 
+import hashlib
 import json
 import logging
+import re
 from pathlib import Path
-from typing import Dict, List
+from typing import BinaryIO, Dict, List, Self, Tuple
 
+import numpy as np
 from openai import OpenAI
 
+from .constants import (
+    EMBEDDING_BACKEND,
+    EMBEDDING_CACHE_DTYPE,
+    EMBEDDING_DIM,
+    EMBEDDING_MODEL,
+    FASTEMBED_BATCH_SIZE,
+    FASTEMBED_DIM,
+    FASTEMBED_MODEL,
+)
+
 logger = logging.getLogger(__name__)
 
+# Cache entries are keyed by a fixed-size content hash instead of the full text
+CACHE_KEY_BYTES = 16
+CACHE_WRITE_BUFFER_BYTES = 64 * 1024
+
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = "?.!"
+
+
+def text_cache_key(text: str) -> bytes:
+    """Return the fixed-size cache key for a text."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=CACHE_KEY_BYTES).digest()
+
+
+def normalize_query(text: str) -> str:
+    """Normalize a query for cache lookup.
+
+    Lowercases, collapses whitespace and strips trailing punctuation, so
+    trivially different spellings of the same query share one embedding.
+    """
+    normalized = _WHITESPACE_PATTERN.sub(" ", text.strip().lower())
+    return normalized.rstrip(_TRAILING_PUNCTUATION).rstrip()
+
 
 class EmbeddingService:
-    """Handles text embeddings using OpenAI API with caching."""
+    """Handles text embeddings using OpenAI API with caching.
+
+    Embeddings are persisted as fixed-size binary records (hash key followed by
+    the vector), so the cache never stores the embedded text itself. Vectors
+    are stored at `cache_dtype` precision (float16 by default); OpenAI
+    embeddings are unit-normalized, so half precision costs no measurable
+    retrieval quality while halving cache size and load time. With "int8"
+    each vector is stored with a per-vector scale, halving the size again.
+
+    Query cache keys are computed from `normalize_query(text)`, so reruns and
+    the E2-E4 experiments reuse one embedding per distinct query. Chunk keys
+    use the exact text.
+    """
 
     def __init__(
         self,
-        api_key: str,
+        api_key: str | None,
         cache_dir: Path,
-        model: str = "text-embedding-3-small",
+        model: str = EMBEDDING_MODEL,
+        embedding_dim: int = EMBEDDING_DIM,
+        cache_dtype: str = EMBEDDING_CACHE_DTYPE,
     ):
-        self.client = OpenAI(api_key=api_key)
+        self.client = self._create_client(api_key, model)
         self.model = model
+        self.embedding_dim = embedding_dim
         self.cache_dir = cache_dir
-
+        vec_dtype = np.dtype(cache_dtype).newbyteorder("<")
+        self.quantized = vec_dtype.kind == "i"
+        fields = [("key", f"V{CACHE_KEY_BYTES}"), ("vec", vec_dtype, (embedding_dim,))]
+        if self.quantized:
+            # Symmetric quantization: vec * scale restores the float vector
+            fields.append(("scale", "<f4"))
+        self.record_dtype = np.dtype(fields)
+
+        # The precision is part of the file name so records are never misread
         self.cache_dir.mkdir(parents=True, exist_ok=True)
-        self.chunks_cache_file = self.cache_dir / "embeddings_chunks.jsonl"
-        self.queries_cache_file = self.cache_dir / "embeddings_queries.jsonl"
+        self.chunks_cache_file = self.cache_dir / f"embeddings_chunks.{cache_dtype}.bin"
+        self.queries_cache_file = (
+            self.cache_dir / f"embeddings_queries.{cache_dtype}.bin"
+        )
+
+        # Cache files stay open for the lifetime of the service (see close())
+        self._cache_handles: Dict[Path, BinaryIO] = {}
 
         # Load existing cache into memory
-        self.chunks_cache: Dict[str, List[float]] = {}
-        self.queries_cache: Dict[str, List[float]] = {}
+        self.chunks_cache: Dict[bytes, np.ndarray] = {}
+        self.queries_cache: Dict[bytes, np.ndarray] = {}
         self._load_caches()
 
         logger.info(f"Initialized embedding service with model: {model}")
@@ -38,32 +101,122 @@ class EmbeddingService:
             logger.info(f"Loaded {len(self.chunks_cache)} cached chunk embeddings")
             logger.info(f"Loaded {len(self.queries_cache)} cached query embeddings")
 
+    def _create_client(self, api_key: str | None, model: str):
+        """Create the client used by `_request_embeddings`."""
+        return OpenAI(api_key=api_key)
+
+    def _request_embeddings(self, texts: List[str]) -> np.ndarray:
+        """Embed texts with the backend, returning a (len(texts), dim) array."""
+        response = self.client.embeddings.create(model=self.model, input=texts)
+        return np.asarray([d.embedding for d in response.data], dtype=np.float32)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Flush and close the open cache files."""
+        for cache_file, handle in self._cache_handles.items():
+            try:
+                handle.close()
+            except OSError as e:
+                logger.warning(f"Failed to close cache file {cache_file}: {e}")
+        self._cache_handles.clear()
+
+    def _cache_for(self, cache_type: str) -> Tuple[Dict[bytes, np.ndarray], Path]:
+        """Return the in-memory cache and backing file for a cache type."""
+        if cache_type == "chunks":
+            return self.chunks_cache, self.chunks_cache_file
+        return self.queries_cache, self.queries_cache_file
+
+    @staticmethod
+    def _cache_key(text: str, cache_type: str) -> bytes:
+        """Return the cache key for a text of the given cache type."""
+        if cache_type == "queries":
+            return text_cache_key(normalize_query(text))
+        return text_cache_key(text)
+
     def _load_caches(self):
         """Load existing embedding caches from disk."""
         if not self.cache_dir:
             return
 
-        # Load chunks cache
-        if self.chunks_cache_file and self.chunks_cache_file.exists():
-            try:
-                with open(self.chunks_cache_file, "r", encoding="utf-8") as f:
-                    for line in f:
-                        data = json.loads(line)
-                        self.chunks_cache[data["text"]] = data["embedding"]
-                logger.debug(f"Loaded {len(self.chunks_cache)} chunks from cache")
-            except Exception as e:
-                logger.warning(f"Failed to load chunks cache: {e}")
-
-        # Load queries cache
-        if self.queries_cache_file and self.queries_cache_file.exists():
+        for cache_type in ("chunks", "queries"):
+            cache, cache_file = self._cache_for(cache_type)
+            self._migrate_legacy_cache(cache_file, cache_type)
+            if not cache_file.exists():
+                continue
             try:
-                with open(self.queries_cache_file, "r", encoding="utf-8") as f:
-                    for line in f:
-                        data = json.loads(line)
-                        self.queries_cache[data["text"]] = data["embedding"]
-                logger.debug(f"Loaded {len(self.queries_cache)} queries from cache")
-            except Exception as e:
-                logger.warning(f"Failed to load queries cache: {e}")
+                # Ignore a trailing partial record left by an interrupted write
+                count = cache_file.stat().st_size // self.record_dtype.itemsize
+                records = np.fromfile(cache_file, dtype=self.record_dtype, count=count)
+                # One contiguous float32 block; cache entries are row views into it
+                vectors = records["vec"].astype(np.float32)
+                if self.quantized:
+                    vectors *= records["scale"][:, np.newaxis]
+                for key, vector in zip(records["key"], vectors):
+                    cache[key.tobytes()] = vector
+                logger.debug(f"Loaded {len(cache)} {cache_type} from cache")
+            except (OSError, ValueError) as e:
+                logger.warning(f"Failed to load {cache_type} cache: {e}")
+
+    def _migrate_legacy_cache(self, cache_file: Path, cache_type: str):
+        """Convert a legacy text-keyed JSONL cache into the binary format."""
+        legacy_file = cache_file.with_name(cache_file.name.split(".")[0] + ".jsonl")
+        if cache_file.exists() or not legacy_file.exists():
+            return
+
+        try:
+            entries = {}
+            with open(legacy_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    data = json.loads(line)
+                    entries[self._cache_key(data["text"], cache_type)] = data[
+                        "embedding"
+                    ]
+            if not entries:
+                # Create the (empty) binary cache so migration is not retried
+                cache_file.touch()
+                logger.info(f"Legacy cache {legacy_file} is empty; nothing to migrate")
+                return
+            cache_file.write_bytes(
+                self._encode_records(
+                    list(entries.keys()), np.asarray(list(entries.values()))
+                )
+            )
+            logger.info(
+                f"Migrated {len(entries)} embeddings from {legacy_file} to {cache_file}"
+            )
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Failed to migrate legacy cache {legacy_file}: {e}")
+
+    def _encode_records(self, keys: List[bytes], vectors: np.ndarray) -> bytes:
+        """Pack cache keys and their (n, dim) vectors into binary records."""
+        records = np.empty(len(keys), dtype=self.record_dtype)
+        records["key"] = np.frombuffer(b"".join(keys), dtype=f"V{CACHE_KEY_BYTES}")
+        if self.quantized:
+            qmax = np.iinfo(self.record_dtype["vec"].base).max
+            scale = np.abs(vectors).max(axis=1) / qmax
+            scale[scale == 0] = 1.0
+            records["scale"] = scale
+            records["vec"] = np.rint(vectors / scale[:, np.newaxis])
+        else:
+            records["vec"] = vectors
+        return records.tobytes()
+
+    def _persist(self, cache_file: Path, keys: List[bytes], vectors: np.ndarray):
+        """Append cache records to a binary cache file."""
+        if not keys:
+            return
+        handle = self._cache_handles.get(cache_file)
+        if handle is None:
+            handle = open(cache_file, "ab", buffering=CACHE_WRITE_BUFFER_BYTES)
+            self._cache_handles[cache_file] = handle
+        handle.write(self._encode_records(keys, vectors))
 
     def embed_text(self, text: str, cache_type: str = "queries") -> List[float]:
         """Generate embedding for a single text with caching.
@@ -75,34 +228,37 @@ class EmbeddingService:
         Returns:
             Embedding vector as list of floats
         """
+        return self.embed_text_np(text, cache_type).tolist()
+
+    def embed_text_np(self, text: str, cache_type: str = "queries") -> np.ndarray:
+        """Generate embedding for a single text as a float32 array.
+
+        Same caching behaviour as `embed_text`; cache hits return the cached
+        array itself, so callers must not modify it in place.
+        """
         # Check appropriate cache
-        cache = self.chunks_cache if cache_type == "chunks" else self.queries_cache
-        if text in cache:
+        cache, cache_file = self._cache_for(cache_type)
+        key = self._cache_key(text, cache_type)
+        vector = cache.get(key)
+        if vector is not None:
             logger.debug(f"Cache hit for {cache_type}: {text[:50]}...")
-            return cache[text]
+            return vector
 
         # Call API
-        response = self.client.embeddings.create(model=self.model, input=text)
-        embedding = response.data[0].embedding
+        vector = self._request_embeddings([text])[0]
 
         # Store in cache
-        cache[text] = embedding
+        cache[key] = vector
 
         # Persist to disk
         if self.cache_dir:
-            cache_file = (
-                self.chunks_cache_file
-                if cache_type == "chunks"
-                else self.queries_cache_file
-            )
             try:
-                with open(cache_file, "a", encoding="utf-8") as f:
-                    f.write(json.dumps({"text": text, "embedding": embedding}) + "\n")
+                self._persist(cache_file, [key], vector[np.newaxis])
                 logger.debug(f"Cached {cache_type} embedding for: {text[:50]}...")
-            except Exception as e:
+            except OSError as e:
                 logger.warning(f"Failed to persist {cache_type} cache: {e}")
 
-        return embedding
+        return vector
 
     def embed_batch(
         self, texts: List[str], batch_size: int = 100, cache_type: str = "chunks"
@@ -117,69 +273,110 @@ class EmbeddingService:
         Returns:
             List of embedding vectors
         """
-        cache = self.chunks_cache if cache_type == "chunks" else self.queries_cache
-        cache_file = (
-            self.chunks_cache_file
-            if cache_type == "chunks"
-            else self.queries_cache_file
-        )
+        return self.embed_batch_np(texts, batch_size, cache_type).tolist()
 
-        all_embeddings = []
-        texts_to_embed = []
-        text_indices = []
+    def embed_batch_np(
+        self, texts: List[str], batch_size: int = 100, cache_type: str = "chunks"
+    ) -> np.ndarray:
+        """Generate embeddings for multiple texts as one float32 array.
 
-        # Separate cached from non-cached texts
-        for idx, text in enumerate(texts):
-            if text in cache:
-                all_embeddings.append((idx, cache[text]))
+        Same caching behaviour as `embed_batch`, but the result is a single
+        contiguous (len(texts), embedding_dim) array instead of nested lists.
+        """
+        cache, cache_file = self._cache_for(cache_type)
+
+        # Hash every text once; all lookups below use the fixed-size key
+        keys = [self._cache_key(text, cache_type) for text in texts]
+        result = np.empty((len(texts), self.embedding_dim), dtype=np.float32)
+        # Texts sharing a key are embedded once and copied to every position
+        pending: List[int] = []
+        duplicates: Dict[bytes, List[int]] = {}
+        for idx, key in enumerate(keys):
+            vector = cache.get(key)
+            if vector is not None:
+                result[idx] = vector
+            elif key in duplicates:
+                duplicates[key].append(idx)
             else:
-                texts_to_embed.append(text)
-                text_indices.append(idx)
+                duplicates[key] = []
+                pending.append(idx)
 
-        if texts_to_embed:
+        if pending:
             logger.info(
-                f"Embedding {len(texts_to_embed)} new {cache_type} (cache had {len(cache)})"
+                f"Embedding {len(pending)} new {cache_type} (cache had {len(cache)})"
             )
         else:
             logger.info(f"All {len(texts)} {cache_type} found in cache")
 
         # Embed non-cached texts in batches
-        new_embeddings = []
-        for i in range(0, len(texts_to_embed), batch_size):
-            batch = texts_to_embed[i : i + batch_size]
-            response = self.client.embeddings.create(model=self.model, input=batch)
+        for i in range(0, len(pending), batch_size):
+            batch_indices = pending[i : i + batch_size]
+            batch = [texts[idx] for idx in batch_indices]
+            vectors = self._request_embeddings(batch)
+
+            for idx, vector in zip(batch_indices, vectors):
+                result[idx] = vector
+                result[duplicates[keys[idx]]] = vector
+                # Update cache
+                cache[keys[idx]] = result[idx].copy()
+
+            # Persist immediately
+            if self.cache_dir:
+                try:
+                    self._persist(
+                        cache_file,
+                        [keys[idx] for idx in batch_indices],
+                        result[batch_indices],
+                    )
+                except OSError as e:
+                    logger.warning(f"Failed to persist {cache_type} cache: {e}")
 
-            for text, embedding_data in zip(batch, response.data):
-                embedding = embedding_data.embedding
-                new_embeddings.append((text, embedding))
+        return result
 
-                # Update cache
-                cache[text] = embedding
-
-                # Persist immediately
-                if self.cache_dir:
-                    try:
-                        with open(cache_file, "a", encoding="utf-8") as f:
-                            f.write(
-                                json.dumps({"text": text, "embedding": embedding})
-                                + "\n"
-                            )
-                    except Exception as e:
-                        logger.warning(f"Failed to persist {cache_type} cache: {e}")
-
-        # Merge cached and new embeddings in original order
-        cached_sorted = sorted(all_embeddings, key=lambda x: x[0])
-        new_sorted = sorted(
-            [
-                (text_indices[i], embedding)
-                for i, (_, embedding) in enumerate(new_embeddings)
-            ],
-            key=lambda x: x[0],
-        )
 
-        all_by_index = {}
-        for idx, embedding in cached_sorted + new_sorted:
-            all_by_index[idx] = embedding
+class FastEmbedService(EmbeddingService):
+    """Embedding service backed by a local FastEmbed (ONNX) model.
 
-        result = [all_by_index[i] for i in range(len(texts))]
-        return result
+    Meant for fast local iteration without OpenAI calls; final benchmark runs
+    use the OpenAI service. Caches are kept in a per-model subfolder since the
+    vectors are not interchangeable with OpenAI embeddings.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        model: str = FASTEMBED_MODEL,
+        embedding_dim: int = FASTEMBED_DIM,
+        cache_dtype: str = EMBEDDING_CACHE_DTYPE,
+    ):
+        super().__init__(
+            api_key=None,
+            cache_dir=cache_dir / model.replace("/", "__"),
+            model=model,
+            embedding_dim=embedding_dim,
+            cache_dtype=cache_dtype,
+        )
+
+    def _create_client(self, api_key: str | None, model: str):
+        try:
+            from fastembed import TextEmbedding
+        except ImportError as e:
+            raise RuntimeError(
+                "fastembed is required for EMBEDDING_BACKEND='fastembed'"
+            ) from e
+        return TextEmbedding(model)
+
+    def _request_embeddings(self, texts: List[str]) -> np.ndarray:
+        vectors = self.client.embed(texts, batch_size=FASTEMBED_BATCH_SIZE)
+        return np.asarray(list(vectors), dtype=np.float32)
+
+
+def create_embedding_service(
+    openai_api_key: str | None, cache_dir: Path
+) -> EmbeddingService:
+    """Create the embedding service selected by EMBEDDING_BACKEND."""
+    if EMBEDDING_BACKEND == "openai":
+        return EmbeddingService(api_key=openai_api_key, cache_dir=cache_dir)
+    if EMBEDDING_BACKEND == "fastembed":
+        return FastEmbedService(cache_dir=cache_dir)
+    raise ValueError(f"Unsupported embedding backend: {EMBEDDING_BACKEND}")
@@ -13,6 +13,8 @@ logger = logging.getLogger(__name__)
 class MarkdownChunker:
     """Structure-aware chunking for Markdown documents."""
 
+    _HEADER_RE = re.compile(r"^(#{1,6})\s+(.+)$", re.MULTILINE)
+
     def __init__(self, chunk_size: int = 512, overlap: int = 128):
         self.chunk_size = chunk_size
         self.overlap = overlap
@@ -64,8 +66,7 @@ class MarkdownChunker:
 
     def _split_by_headers(self, content: str) -> List[dict]:
         """Split content by markdown headers."""
-        header_pattern = re.compile(r"^(#{1,6})\s+(.+)$", re.MULTILINE)
-        matches = list(header_pattern.finditer(content))
+        matches = list(self._HEADER_RE.finditer(content))
 
         if not matches:
             return [{"header": "", "body": content.strip()}]
@@ -81,16 +82,15 @@ class MarkdownChunker:
         return sections
 
     def _split_with_overlap(self, text: str, size: int, overlap: int) -> List[str]:
-        """Split text into chunks with overlap."""
-        chunks = []
-        start = 0
-        while start < len(text):
-            end = start + size
-            chunks.append(text[start:end])
-            start = end - overlap
-            if start >= len(text):
-                break
-        return chunks
+        """Split text into chunks with overlap.
+
+        Chunk i covers text[i * (size - overlap) : i * (size - overlap) + size],
+        so the start offsets are computed up front instead of in a loop.
+        """
+        stride = size - overlap
+        if stride <= 0:
+            raise ValueError(f"overlap ({overlap}) must be smaller than size ({size})")
+        return [text[start : start + size] for start in range(0, len(text), stride)]
 
 
 def load_kb_documents(kb_dir: Path) -> List[dict]:
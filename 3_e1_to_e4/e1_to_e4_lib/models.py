@@ -10,30 +10,21 @@ class QueryInput(BaseModel):
 
 
 class DocumentChunk(BaseModel):
-    """Represents a document chunk for storage and retrieval."""
+    """Represents a document chunk for storage and retrieval.
+
+    Embeddings are not stored on the chunk; they are passed to the vector
+    store as a separate matrix (see VectorStore.upsert_chunks).
+    """
 
     chunk_id: str
     text: str
-    embedding: List[float] = []  # Will be populated after embedding
     score: float = 0.0  # Will be populated after retrieval
     rerank_score: float = 0.0  # Will be populated after reranking
-    metadata: dict = {}
-
-
-class E1Response(BaseModel):
-    """Baseline response format (no retrieval)."""
-
-    answer: str
-
-
-class E2Response(BaseModel):
-    """Standard RAG response format."""
-
-    answer: str
+    metadata: dict = Field(default_factory=dict)
 
 
-class E3Response(BaseModel):
-    """Filtered RAG response format."""
+class AnswerResponse(BaseModel):
+    """Plain answer response format shared by E1, E2 and E3."""
 
     answer: str
 
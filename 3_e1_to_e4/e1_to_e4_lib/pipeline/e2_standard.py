@@ -1,26 +1,35 @@
-import json
+import asyncio
 import logging
-import os
 import time
 from pathlib import Path
-from typing import List
-
-from tqdm import tqdm
+from typing import Dict, List, Tuple
 
 from ..agents import create_e2_agent, create_openrouter_model
 from ..constants import (
-    CHUNK_OVERLAP,
-    CHUNK_SIZE,
     E2_TOP_K,
+    EMBEDDING_BACKEND,
     EMBEDDINGS_CACHE_FOLDER,
     OPENROUTER_MODEL,
     QDRANT_COLLECTION,
+    QDRANT_ON_DISK,
+    QDRANT_STORAGE_FOLDER,
+    QUERY_EMBED_BATCH_SIZE,
+    RATE_LIMIT_BURST,
     REQUEST_DELAY_SECONDS,
 )
-from ..embeddings import EmbeddingService
-from ..kb_loader import MarkdownChunker, load_kb_documents
+from ..embeddings import EmbeddingService, create_embedding_service
 from ..models import DocumentChunk, ExperimentResult, QueryInput
+from ..rate_limiter import TokenBucket
 from ..vector_store import VectorStore
+from .helpers import (
+    ensure_kb_indexed,
+    format_context,
+    load_existing_ids,
+    load_queries,
+    open_output,
+    pending_queries,
+    process_concurrently,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -43,160 +52,151 @@ def run_e2_standard(
     )
 
     # Load queries
-    queries: List[QueryInput] = []
-    with open(queries_file, "r", encoding="utf-8") as f:
-        for line in f:
-            queries.append(QueryInput(**json.loads(line)))
+    queries = load_queries(queries_file)
 
     # Load existing results for resume
-    existing_ids = set()
-    if output_file.exists() and not overwrite:
-        logger.info("Found existing output file %s; loading to resume", output_file)
-        with open(output_file, "r", encoding="utf-8") as f:
-            for line in f:
-                result = json.loads(line)
-                existing_ids.add(result["query_id"])
+    existing_ids = load_existing_ids(output_file, overwrite)
+    pending = pending_queries(queries, existing_ids, overwrite)
 
     # Initialize services if not dry run
     vector_store = None
     embedding_service = None
     agent = None
+    rate_limiter = None
+
+    try:
+        if not dry_run:
+            if not openrouter_api_key:
+                raise RuntimeError("OPENROUTER_API_KEY required when not dry-run")
+            if EMBEDDING_BACKEND == "openai" and not openai_api_key:
+                raise RuntimeError("OPENAI_API_KEY required when not dry-run")
+
+            # Initialize embedding service
+            embedding_service = create_embedding_service(
+                openai_api_key=openai_api_key,
+                cache_dir=kb_dir / EMBEDDINGS_CACHE_FOLDER,
+            )
 
-    if not dry_run:
-        if not openrouter_api_key:
-            raise RuntimeError("OPENROUTER_API_KEY required when not dry-run")
-        if not openai_api_key:
-            raise RuntimeError("OPENAI_API_KEY required when not dry-run")
-
-        # Initialize vector store
-        vector_store = VectorStore(
-            collection_name=QDRANT_COLLECTION,
-            embedding_dim=1536,  # text-embedding-3-small dimension
-        )
-
-        # Initialize embedding service
-        embedding_service = EmbeddingService(
-            api_key=openai_api_key,
-            cache_dir=kb_dir / EMBEDDINGS_CACHE_FOLDER,
-        )
-
-        # Index knowledge base if not already done
-        if vector_store.get_collection_size() == 0:
-            _index_kb(kb_dir, vector_store, embedding_service)
+            # Initialize vector store
+            vector_store = VectorStore(
+                collection_name=QDRANT_COLLECTION,
+                embedding_dim=embedding_service.embedding_dim,
+                storage_path=kb_dir / QDRANT_STORAGE_FOLDER if QDRANT_ON_DISK else None,
+            )
 
-        # Create agent
-        or_model = create_openrouter_model(OPENROUTER_MODEL, openrouter_api_key)
-        agent = create_e2_agent(or_model)
+            # Index knowledge base unless an up-to-date index exists
+            ensure_kb_indexed(kb_dir, vector_store, embedding_service)
 
-    # Process queries
-    output_file.parent.mkdir(parents=True, exist_ok=True)
-    write_mode = "w" if overwrite else "a"
+            # Create agent
+            or_model = create_openrouter_model(OPENROUTER_MODEL, openrouter_api_key)
+            agent = create_e2_agent(or_model)
+            rate_limiter = TokenBucket(
+                1.0 / REQUEST_DELAY_SECONDS, burst=RATE_LIMIT_BURST
+            )
 
-    with open(output_file, write_mode, encoding="utf-8") as out_f:
-        for query in tqdm(queries, desc="Processing E2 queries"):
-            if query.query_id in existing_ids and not overwrite:
-                logger.info("Skipping existing query_id: %s", query.query_id)
-                continue
+        retrieved, retrieval_times = _retrieve_all(
+            queries=pending,
+            vector_store=vector_store,
+            embedding_service=embedding_service,
+            dry_run=dry_run,
+        )
 
-            # Track start time for rate limiting
-            query_start_time = time.time()
+        async def _process(query: QueryInput) -> ExperimentResult:
+            return await _process_query(
+                query=query,
+                retrieved_chunks=retrieved[query.query_id],
+                retrieval_time=retrieval_times[query.query_id],
+                agent=agent,
+                dry_run=dry_run,
+            )
 
-            try:
-                result = _process_query(
-                    query=query,
-                    vector_store=vector_store,
-                    embedding_service=embedding_service,
-                    agent=agent,
-                    dry_run=dry_run,
+        # Process queries concurrently (OpenRouter: 20 req/min on average)
+        with open_output(output_file, overwrite, durable=not dry_run) as out_f:
+            asyncio.run(
+                process_concurrently(
+                    queries=pending,
+                    process_query=_process,
+                    out_f=out_f,
+                    desc="Processing E2 queries",
+                    rate_limiter=rate_limiter,
                 )
-
-                out_f.write(result.model_dump_json() + "\n")
-                out_f.flush()
-                os.fsync(out_f.fileno())
-                logger.info("Processed query_id: %s", query.query_id)
-
-                # Rate limiting for OpenRouter API (20 req/min = 1 req every 3 sec)
-                if not dry_run:
-                    query_elapsed = time.time() - query_start_time
-                    sleep_time = max(0, REQUEST_DELAY_SECONDS - query_elapsed)
-                    if sleep_time > 0:
-                        logger.debug(f"Rate limiting: sleeping {sleep_time:.2f}s")
-                        time.sleep(sleep_time)
-
-            except Exception as e:
-                logger.exception("Failed to process query %s: %s", query.query_id, e)
+            )
+    finally:
+        # Release cache file handles and the on-disk Qdrant lock on any exit
+        if embedding_service is not None:
+            try:
+                embedding_service.close()
+            except Exception:
+                logger.exception("Failed to close embedding service")
+        if vector_store is not None:
+            try:
+                vector_store.close()
+            except Exception:
+                logger.exception("Failed to close vector store")
 
     logger.info("E2 Standard RAG completed; output in %s", output_file)
 
 
-def _index_kb(
-    kb_dir: Path, vector_store: VectorStore, embedding_service: EmbeddingService
-):
-    """Index knowledge base into vector store."""
-    logger.info("Indexing knowledge base...")
-
-    # Load documents
-    documents = load_kb_documents(kb_dir)
-    chunker = MarkdownChunker(chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP)
-
-    all_chunks = []
-    for doc in tqdm(documents, desc="Chunking documents"):
-        chunks = chunker.chunk_document(doc["filename"], doc["content"])
-        all_chunks.extend(chunks)
-
-    logger.info(f"Generated {len(all_chunks)} chunks")
-
-    # Embed chunks in batches
-    batch_size = 100
-    for i in tqdm(range(0, len(all_chunks), batch_size), desc="Embedding chunks"):
-        batch = all_chunks[i : i + batch_size]
-        texts = [chunk.text for chunk in batch]
-        embeddings = embedding_service.embed_batch(texts, cache_type="chunks")
+def _retrieve_all(
+    queries: List[QueryInput],
+    vector_store: VectorStore | None,
+    embedding_service: EmbeddingService | None,
+    dry_run: bool,
+) -> Tuple[Dict[str, List[DocumentChunk]], Dict[str, float]]:
+    """Retrieve context chunks for every query before the LLM phase.
+
+    All queries are embedded up front in batched calls. Each query is then
+    searched on its own and timed individually, so the reported retrieval
+    time is a per-query measurement of the vector search. Retrieval runs
+    before the concurrent LLM calls, so the timings are not inflated by them.
+    Returns the chunks and the retrieval time in ms per query_id.
+    """
+    query_embeddings = None
+    if not dry_run:
+        assert embedding_service is not None
+        assert vector_store is not None
+        # Queries are embedded up front in batched calls; the embedding is
+        # not part of the per-query retrieval time
+        query_embeddings = embedding_service.embed_batch_np(
+            [query.query for query in queries],
+            batch_size=QUERY_EMBED_BATCH_SIZE,
+            cache_type="queries",
+        )
 
-        # Add embeddings to chunks
-        for chunk, embedding in zip(batch, embeddings):
-            chunk.embedding = embedding
+    retrieved: Dict[str, List[DocumentChunk]] = {}
+    retrieval_times: Dict[str, float] = {}
+    for i, query in enumerate(queries):
+        retrieval_start = time.time()
+
+        if dry_run:
+            # Mock retrieval for dry run
+            chunks = [
+                DocumentChunk(
+                    chunk_id=f"dry_run_chunk_{i}",
+                    text=f"[DRY_RUN] Chunk {i} content related to {query.query[:20]}...",
+                    score=0.9 - i * 0.1,
+                    metadata={"filename": f"mock_doc_{i}.md"},
+                )
+                for i in range(E2_TOP_K)
+            ]
+        else:
+            # Real retrieval
+            chunks = vector_store.search(query_embeddings[i], top_k=E2_TOP_K)
 
-        vector_store.upsert_chunks(batch)
+        retrieved[query.query_id] = chunks
+        retrieval_times[query.query_id] = (time.time() - retrieval_start) * 1000
 
-    logger.info(f"Indexed {len(all_chunks)} chunks into vector store")
+    return retrieved, retrieval_times
 
 
-def _process_query(
+async def _process_query(
     query: QueryInput,
-    vector_store: VectorStore | None,
-    embedding_service: EmbeddingService | None,
+    retrieved_chunks: List[DocumentChunk],
+    retrieval_time: float,
     agent,
     dry_run: bool,
 ) -> ExperimentResult:
-    """Process a single query for E2."""
-    # Retrieval phase
-    retrieval_start = time.time()
-    retrieved_chunks = []
-
-    if dry_run:
-        # Mock retrieval for dry run
-        retrieved_chunks = [
-            DocumentChunk(
-                chunk_id=f"dry_run_chunk_{i}",
-                text=f"[DRY_RUN] Chunk {i} content related to {query.query[:20]}...",
-                score=0.9 - i * 0.1,
-                metadata={"filename": f"mock_doc_{i}.md"},
-            )
-            for i in range(E2_TOP_K)
-        ]
-    else:
-        # Real retrieval
-        assert embedding_service is not None
-        assert vector_store is not None
-
-        query_embedding = embedding_service.embed_text(
-            query.query, cache_type="queries"
-        )
-        retrieved_chunks = vector_store.search(query_embedding, top_k=E2_TOP_K)
-
-    retrieval_time = (time.time() - retrieval_start) * 1000
-
+    """Generate the answer for a single E2 query from its retrieved chunks."""
     # LLM generation phase
     llm_start = time.time()
 
@@ -204,11 +204,11 @@ def _process_query(
         llm_answer = "[DRY_RUN] No LLM call - would use retrieved context"
     else:
         # Format context from retrieved chunks
-        context = _format_context(retrieved_chunks)
+        context = format_context(retrieved_chunks)
         prompt = f"Context:\n{context}\n\nQuestion: {query.query}"
 
         try:
-            result = agent.run_sync(prompt)
+            result = await agent.run(prompt)
             llm_answer = result.output.answer
         except Exception as e:
             logger.exception("LLM call failed for query %s: %s", query.query_id, e)
@@ -229,12 +229,3 @@ def _process_query(
         llm_time_ms=llm_time,
         total_time_ms=total_time,
     )
-
-
-def _format_context(chunks: List[DocumentChunk]) -> str:
-    """Format retrieved chunks as context for LLM."""
-    context_parts = []
-    for i, chunk in enumerate(chunks, 1):
-        filename = chunk.metadata.get("filename", "unknown")
-        context_parts.append(f"[Source {i}: {filename}]\n{chunk.text}")
-    return "\n\n".join(context_parts)
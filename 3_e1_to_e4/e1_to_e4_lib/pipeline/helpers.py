@@ -0,0 +1,399 @@
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Awaitable, BinaryIO, Callable, List, Set, TextIO, Tuple
+
+import numpy as np
+import orjson
+from tqdm import tqdm
+
+from ..constants import CHUNK_OVERLAP, CHUNK_SIZE, MAX_CONCURRENT_LLM_CALLS
+from ..embeddings import EmbeddingService
+from ..kb_loader import MarkdownChunker, load_kb_documents
+from ..models import DocumentChunk, ExperimentResult, QueryInput
+from ..rate_limiter import TokenBucket
+from ..vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+INDEX_BATCH_SIZE = 100
+INDEX_QUEUE_SIZE = 4
+# Embedded batches are accumulated into upserts of this many points
+INDEX_UPSERT_BATCH_SIZE = 1024
+
+# Durable outputs are fsynced after this many result lines (and on close)
+OUTPUT_FSYNC_EVERY = 16
+
+# Written next to a persisted collection to detect a stale index
+KB_FINGERPRINT_FILE = "kb_fingerprint.txt"
+# Bump when the point payload or id scheme changes to force a reindex
+KB_INDEX_VERSION = 2
+
+# Marks the end of the chunk stream on the indexing queue
+_END_OF_CHUNKS = None
+
+# query_id is the first field written by ExperimentResult.model_dump_json;
+# whitespace is allowed so outputs written by json.dumps also match
+_QUERY_ID_PATTERN = re.compile(rb'^\{\s*"query_id"\s*:\s*"([^"\\]+)"')
+
+
+def load_queries(queries_file: Path) -> List[QueryInput]:
+    """Load experiment queries from a JSONL file.
+
+    Each line is validated by pydantic directly from bytes, without building
+    an intermediate dict.
+    """
+    data = Path(queries_file).read_bytes()
+    return [
+        QueryInput.model_validate_json(line)
+        for line in data.split(b"\n")
+        if line.strip()
+    ]
+
+
+def load_existing_ids(output_file: Path, overwrite: bool) -> Set[str]:
+    """Return query ids already present in an output file, for resume."""
+    existing_ids: Set[str] = set()
+    if output_file.exists() and not overwrite:
+        logger.info("Found existing output file %s; loading to resume", output_file)
+        for line in output_file.read_bytes().split(b"\n"):
+            match = _QUERY_ID_PATTERN.match(line)
+            # A line cut off by a crash never ends with the closing brace
+            if match and line.rstrip().endswith(b"}"):
+                existing_ids.add(match.group(1).decode("utf-8"))
+            elif line.strip():
+                # Fall back to a full parse for lines in any other layout
+                try:
+                    existing_ids.add(orjson.loads(line)["query_id"])
+                except (orjson.JSONDecodeError, KeyError, TypeError):
+                    # Not JSON, not an object, or no query_id: not a result line
+                    logger.warning("Skipping unreadable line in %s", output_file)
+    return existing_ids
+
+
+def pending_queries(
+    queries: List[QueryInput], existing_ids: Set[str], overwrite: bool
+) -> List[QueryInput]:
+    """Return the queries that still need to be processed."""
+    pending: List[QueryInput] = []
+    for query in queries:
+        if query.query_id in existing_ids and not overwrite:
+            logger.info("Skipping existing query_id: %s", query.query_id)
+            continue
+        pending.append(query)
+    return pending
+
+
+async def process_concurrently(
+    queries: List[QueryInput],
+    process_query: Callable[[QueryInput], Awaitable[ExperimentResult]],
+    out_f: TextIO,
+    desc: str,
+    rate_limiter: TokenBucket | None = None,
+    max_concurrency: int = MAX_CONCURRENT_LLM_CALLS,
+):
+    """Process queries concurrently and write each result as it completes.
+
+    At most `max_concurrency` queries are in flight; each takes a rate
+    limiter token first, so the overall request rate stays within the
+    OpenRouter quota. Results are written from this coroutine only, so output
+    lines never interleave.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _worker(query: QueryInput) -> ExperimentResult | None:
+        async with semaphore:
+            if rate_limiter is not None:
+                await rate_limiter.acquire_async()
+            try:
+                return await process_query(query)
+            except Exception as e:
+                logger.exception("Failed to process query %s: %s", query.query_id, e)
+                return None
+
+    tasks = [asyncio.create_task(_worker(query)) for query in queries]
+    for next_result in tqdm(asyncio.as_completed(tasks), total=len(tasks), desc=desc):
+        result = await next_result
+        if result is None:
+            continue
+        try:
+            out_f.write(result.model_dump_json() + "\n")
+            logger.info("Processed query_id: %s", result.query_id)
+        except Exception:
+            logger.exception("Failed to write result for query_id %s", result.query_id)
+
+
+def format_context(chunks: List[DocumentChunk]) -> str:
+    """Format retrieved chunks as numbered sources for the LLM prompt."""
+    return "\n\n".join(
+        f"[Source {i}: {chunk.metadata.get('filename', 'unknown')}]\n{chunk.text}"
+        for i, chunk in enumerate(chunks, 1)
+    )
+
+
+def open_output(output_file: Path, overwrite: bool, durable: bool = True) -> TextIO:
+    """Open an experiment output file for appending results.
+
+    Durable outputs are line-buffered, so each result reaches the OS as soon
+    as it is written and survives a crash of this process, and are fsynced
+    every OUTPUT_FSYNC_EVERY lines and on close, so an OS crash loses at most
+    that many results (a resume re-runs them). Non-durable outputs (dry runs)
+    are block-buffered and never fsynced.
+    """
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    if not overwrite and _has_partial_last_line(output_file):
+        # Terminate a line cut off by a crash so new results start cleanly
+        with open(output_file, "ab") as f:
+            f.write(b"\n")
+    if not durable:
+        return open(output_file, "w" if overwrite else "a", encoding="utf-8")
+    return _SyncingWriter(
+        open(output_file, "wb" if overwrite else "ab"),
+        sync_every=OUTPUT_FSYNC_EVERY,
+    )
+
+
+class _SyncingWriter(io.TextIOWrapper):
+    """Line-buffered UTF-8 text file that fsyncs every `sync_every` lines."""
+
+    def __init__(self, buffer: BinaryIO, sync_every: int):
+        super().__init__(buffer, encoding="utf-8", line_buffering=True)
+        self.sync_every = sync_every
+        self._unsynced = 0
+
+    def write(self, s: str) -> int:
+        written = super().write(s)
+        self._unsynced += s.count("\n")
+        if self._unsynced >= self.sync_every:
+            self.sync()
+        return written
+
+    def sync(self) -> None:
+        """Flush and fsync everything written so far."""
+        self.flush()
+        os.fsync(self.fileno())
+        self._unsynced = 0
+
+    def close(self) -> None:
+        if not self.closed and self._unsynced:
+            self.sync()
+        super().close()
+
+
+def _has_partial_last_line(output_file: Path) -> bool:
+    """Return True if a non-empty file does not end with a newline."""
+    if not output_file.exists() or output_file.stat().st_size == 0:
+        return False
+    with open(output_file, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) != b"\n"
+
+
+def kb_fingerprint(
+    kb_dir: Path, embedding_model: str, quantization: str | None = None
+) -> str:
+    """Fingerprint everything the KB index depends on.
+
+    Covers the KB files (name, size and modification time), the chunking
+    parameters, the embedding model, the collection quantization and the
+    index layout version, so any change forces a reindex.
+    """
+    files = []
+    for path in sorted(Path(kb_dir).glob("*.md")):
+        stat = path.stat()
+        files.append((path.name, stat.st_size, stat.st_mtime_ns))
+    key = repr(
+        (
+            KB_INDEX_VERSION,
+            files,
+            CHUNK_SIZE,
+            CHUNK_OVERLAP,
+            embedding_model,
+            quantization,
+        )
+    )
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def ensure_kb_indexed(
+    kb_dir: Path, vector_store: VectorStore, embedding_service: EmbeddingService
+):
+    """Index the knowledge base unless the store already holds a current index.
+
+    A persisted collection is reused only when the fingerprint recorded when
+    it was built still matches; otherwise it is cleared and rebuilt. The
+    fingerprint is removed before the rebuild and written only once it has
+    completed.
+    """
+    fingerprint = kb_fingerprint(
+        kb_dir, embedding_service.model, vector_store.quantization
+    )
+    fingerprint_file = (
+        vector_store.storage_path / KB_FINGERPRINT_FILE
+        if vector_store.storage_path is not None
+        else None
+    )
+
+    if vector_store.get_collection_size() > 0:
+        if fingerprint_file is None or (
+            fingerprint_file.exists() and fingerprint_file.read_text() == fingerprint
+        ):
+            logger.info("Reusing indexed knowledge base")
+            return
+        logger.info("Knowledge base changed since it was indexed; reindexing")
+
+    # Drop the old fingerprint first, so a rebuild interrupted after some
+    # points were upserted is never mistaken for a current index
+    if fingerprint_file is not None:
+        fingerprint_file.unlink(missing_ok=True)
+
+    # Recreate the collection, which also picks up a changed embedding_dim
+    vector_store.clear()
+    index_kb(kb_dir, vector_store, embedding_service)
+    # index_kb returns only after finish_bulk_upload has completed
+    if fingerprint_file is not None:
+        fingerprint_file.write_text(fingerprint)
+
+
+def index_kb(
+    kb_dir: Path, vector_store: VectorStore, embedding_service: EmbeddingService
+):
+    """Index knowledge base into vector store, leaving it empty on failure.
+
+    A persistent collection is only reused when it is non-empty, so a partly
+    indexed collection must not survive an interrupted run.
+    """
+    try:
+        _index_kb(kb_dir, vector_store, embedding_service)
+    except BaseException:
+        logger.warning("Indexing failed; clearing partial collection")
+        vector_store.clear()
+        raise
+
+
+def _index_kb(
+    kb_dir: Path, vector_store: VectorStore, embedding_service: EmbeddingService
+):
+    """Index knowledge base into vector store.
+
+    Indexing runs as a three-stage pipeline connected by bounded queues:
+    a chunking thread produces fixed-size batches, the calling thread embeds
+    them, and an upload thread upserts embedded batches into the vector
+    store. Embedding requests start as soon as the first batch is chunked,
+    and the next batch is embedded while the previous one is uploaded.
+
+    The upload thread merges embedded batches into upserts of
+    INDEX_UPSERT_BATCH_SIZE points sent without waiting for Qdrant to apply
+    them; only the final upsert waits, so the index is complete on return.
+    """
+    logger.info("Indexing knowledge base...")
+
+    # Load documents
+    documents = load_kb_documents(kb_dir)
+    chunker = MarkdownChunker(chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP)
+
+    batches: queue.Queue[List[DocumentChunk] | None] = queue.Queue(
+        maxsize=INDEX_QUEUE_SIZE
+    )
+    uploads: queue.Queue[Tuple[List[DocumentChunk], np.ndarray] | None] = queue.Queue(
+        maxsize=INDEX_QUEUE_SIZE
+    )
+    stop = threading.Event()
+
+    def _put(target: queue.Queue, item) -> bool:
+        # Poll so a stage exits if another stage has failed
+        while not stop.is_set():
+            try:
+                target.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(source: queue.Queue):
+        while not stop.is_set():
+            try:
+                return source.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return _END_OF_CHUNKS
+
+    def _produce() -> int:
+        produced = 0
+        pending: List[DocumentChunk] = []
+        try:
+            for doc in documents:
+                pending.extend(chunker.chunk_document(doc["filename"], doc["content"]))
+                while len(pending) >= INDEX_BATCH_SIZE:
+                    batch = pending[:INDEX_BATCH_SIZE]
+                    pending = pending[INDEX_BATCH_SIZE:]
+                    if not _put(batches, batch):
+                        return produced
+                    produced += len(batch)
+            if pending and _put(batches, pending):
+                produced += len(pending)
+        finally:
+            _put(batches, _END_OF_CHUNKS)
+        return produced
+
+    def _upload(progress: tqdm) -> int:
+        uploaded = 0
+        chunks: List[DocumentChunk] = []
+        vectors: List[np.ndarray] = []
+        try:
+            while (item := _get(uploads)) is not _END_OF_CHUNKS:
+                chunks.extend(item[0])
+                vectors.append(item[1])
+                if len(chunks) >= INDEX_UPSERT_BATCH_SIZE:
+                    vector_store.upsert_chunks(
+                        chunks, vectors=np.concatenate(vectors), wait=False
+                    )
+                    uploaded += len(chunks)
+                    progress.update(len(chunks))
+                    chunks, vectors = [], []
+            if stop.is_set():
+                return uploaded
+            # Waiting on the last upsert also waits for the queued ones
+            vector_store.upsert_chunks(
+                chunks,
+                vectors=np.concatenate(vectors)
+                if vectors
+                else np.empty((0, vector_store.embedding_dim), dtype=np.float32),
+                wait=True,
+            )
+            uploaded += len(chunks)
+            progress.update(len(chunks))
+        except BaseException:
+            stop.set()
+            raise
+        return uploaded
+
+    with (
+        ThreadPoolExecutor(max_workers=2) as executor,
+        tqdm(desc="Embedding chunks", unit="chunk") as progress,
+    ):
+        producer = executor.submit(_produce)
+        uploader = executor.submit(_upload, progress)
+        try:
+            while (batch := _get(batches)) is not _END_OF_CHUNKS:
+                texts = [chunk.text for chunk in batch]
+                vectors = embedding_service.embed_batch_np(texts, cache_type="chunks")
+                if not _put(uploads, (batch, vectors)):
+                    break
+            _put(uploads, _END_OF_CHUNKS)
+            # Re-raise any upload error, then wait for the queue to drain
+            indexed = uploader.result()
+        finally:
+            stop.set()
+        # Re-raise any chunking error from the producer thread
+        producer.result()
+
+    vector_store.finish_bulk_upload()
+    logger.info(f"Indexed {indexed} chunks into vector store")
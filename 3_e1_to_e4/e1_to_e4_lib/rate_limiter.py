@@ -0,0 +1,54 @@
+"""Token-bucket rate limiting for LLM API calls."""
+
+import asyncio
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Token-bucket rate limiter.
+
+    Tokens refill continuously at `rate_per_sec` up to `burst`. Each call takes
+    one token; when the bucket is empty the caller waits until its token has
+    been refilled. Unlike a fixed delay between calls, a slow call does not
+    delay the next one, and short bursts are absorbed by the bucket.
+
+    Safe to share between threads; `acquire_async` can be used from coroutines.
+    """
+
+    def __init__(self, rate_per_sec: float, burst: int = 1):
+        self.rate_per_sec = rate_per_sec
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take one token and return how long the caller must wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._updated
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate_per_sec)
+            self._updated = now
+            # Going negative reserves a future token for this caller
+            self._tokens -= 1.0
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate_per_sec
+
+    def acquire(self) -> None:
+        """Block until a token is available."""
+        wait = self._reserve()
+        if wait > 0:
+            logger.debug(f"Rate limiting: sleeping {wait:.2f}s")
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        """Wait (without blocking the event loop) until a token is available."""
+        wait = self._reserve()
+        if wait > 0:
+            logger.debug(f"Rate limiting: sleeping {wait:.2f}s")
+            await asyncio.sleep(wait)
@@ -3,22 +3,44 @@
 import logging
 from typing import List
 
+import numpy as np
 from sentence_transformers import CrossEncoder
 
+from .constants import RERANK_BATCH_SIZE, RERANKER_BACKEND, RERANKER_ONNX_FILE
 from .models import DocumentChunk
 
 logger = logging.getLogger(__name__)
 
 
 class Reranker:
-    """Rerank retrieved chunks using cross-encoder."""
+    """Rerank retrieved chunks using cross-encoder.
 
-    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"):
-        self.model = CrossEncoder(model_name)
-        logger.info(f"Initialized reranker with model: {model_name}")
+    With backend "onnx" the model runs on ONNX Runtime from the export file
+    `onnx_file` (e.g. a dynamically int8-quantized one) instead of PyTorch.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        backend: str = RERANKER_BACKEND,
+        onnx_file: str = RERANKER_ONNX_FILE,
+    ):
+        if backend == "torch":
+            self.model = CrossEncoder(model_name)
+        elif backend == "onnx":
+            self.model = CrossEncoder(
+                model_name, backend="onnx", model_kwargs={"file_name": onnx_file}
+            )
+        else:
+            raise ValueError(f"Unsupported reranker backend: {backend}")
+        logger.info(f"Initialized reranker with model: {model_name} ({backend})")
 
     def rerank(
-        self, query: str, chunks: List[DocumentChunk], top_k: int = 5
+        self,
+        query: str,
+        chunks: List[DocumentChunk],
+        top_k: int = 5,
+        batch_size: int = RERANK_BATCH_SIZE,
     ) -> List[DocumentChunk]:
         """Rerank chunks based on query relevance.
 
@@ -26,25 +48,33 @@ class Reranker:
             query: User query
             chunks: List of DocumentChunk objects
             top_k: Number of top chunks to return
+            batch_size: Number of pairs per cross-encoder forward pass
 
         Returns:
             Reranked chunks (top_k)
         """
-        if not chunks:
+        k = min(top_k, len(chunks))
+        if k <= 0:
             return []
 
         # Prepare pairs for cross-encoder: [(query, doc1), (query, doc2), ...]
         pairs = [[query, chunk.text] for chunk in chunks]
 
         # Get reranking scores using predict
-        scores = self.model.predict(pairs)
+        scores = np.asarray(
+            self.model.predict(pairs, batch_size=batch_size, show_progress_bar=False)
+        )
 
-        # Attach new scores and sort
-        for chunk, score in zip(chunks, scores):
-            chunk.rerank_score = float(score)
-            # Keep original score for comparison
+        # Select the top k without sorting all candidates, then order them
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
 
-        reranked = sorted(chunks, key=lambda x: x.rerank_score, reverse=True)
+        # Attach new scores to the kept chunks (score keeps the similarity)
+        reranked = []
+        for idx in top:
+            chunk = chunks[idx]
+            chunk.rerank_score = float(scores[idx])
+            reranked.append(chunk)
 
         logger.debug(f"Reranked {len(chunks)} chunks, returning top {top_k}")
-        return reranked[:top_k]
+        return reranked
@@ -2,30 +2,67 @@
 
 import hashlib
 import logging
+from pathlib import Path
 from typing import List
 
+import numpy as np
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, PointStruct, VectorParams
-
+from qdrant_client.models import (
+    Batch,
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    Distance,
+    OptimizersConfigDiff,
+    QuantizationConfig,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    ScoredPoint,
+    SearchParams,
+    VectorParams,
+)
+
+from .constants import QDRANT_INDEXING_THRESHOLD, QDRANT_QUANTIZATION
 from .models import DocumentChunk
 
 logger = logging.getLogger(__name__)
 
+# Point ids are 62-bit hashes of the chunk_id
+_POINT_ID_MASK = (1 << 62) - 1
+
+# Payload fields returned by searches (all that DocumentChunk needs)
+_SEARCH_PAYLOAD = ["chunk_id", "text", "metadata"]
+
 
 class VectorStore:
-    """Manages Qdrant vector database operations."""
+    """Manages Qdrant vector database operations.
+
+    With a `storage_path` the collection is persisted there (vectors flagged
+    on_disk so a Qdrant server memory-maps them); otherwise it lives in memory.
+    """
 
     def __init__(
         self,
         collection_name: str,
         embedding_dim: int = 1536,
+        quantization: str | None = QDRANT_QUANTIZATION,
+        storage_path: Path | None = None,
     ):
         self.collection_name = collection_name
         self.embedding_dim = embedding_dim
-
-        # Always use in-memory for experiments
-        self.client = QdrantClient(":memory:")
-        logger.info("Initialized in-memory Qdrant vector store")
+        self.quantization = quantization
+        self.search_params = _quantization_search_params(quantization)
+        self.storage_path = storage_path
+        self.on_disk = storage_path is not None
+
+        if storage_path is None:
+            self.client = QdrantClient(":memory:")
+            logger.info("Initialized in-memory Qdrant vector store")
+        else:
+            storage_path.mkdir(parents=True, exist_ok=True)
+            self.client = QdrantClient(path=str(storage_path))
+            logger.info(f"Initialized on-disk Qdrant vector store at {storage_path}")
 
         self._ensure_collection()
 
@@ -36,40 +73,75 @@ class VectorStore:
             self.client.create_collection(
                 collection_name=self.collection_name,
                 vectors_config=VectorParams(
-                    size=self.embedding_dim, distance=Distance.COSINE
+                    size=self.embedding_dim,
+                    distance=Distance.COSINE,
+                    on_disk=self.on_disk,
+                ),
+                quantization_config=_quantization_config(self.quantization),
+                # Defer HNSW building until the bulk upload is done
+                optimizers_config=OptimizersConfigDiff(
+                    memmap_threshold=QDRANT_INDEXING_THRESHOLD, indexing_threshold=0
                 ),
             )
             logger.info(f"Created collection: {self.collection_name}")
 
-    def upsert_chunks(self, chunks: List[DocumentChunk]) -> None:
+    def finish_bulk_upload(self) -> None:
+        """Re-enable index building once the initial upload is complete."""
+        self.client.update_collection(
+            collection_name=self.collection_name,
+            optimizers_config=OptimizersConfigDiff(
+                indexing_threshold=QDRANT_INDEXING_THRESHOLD
+            ),
+        )
+
+    def clear(self) -> None:
+        """Drop all points by recreating an empty collection."""
+        self.client.delete_collection(self.collection_name)
+        self._ensure_collection()
+
+    def close(self) -> None:
+        """Release the Qdrant client (and the on-disk storage lock)."""
+        self.client.close()
+
+    def upsert_chunks(
+        self, chunks: List[DocumentChunk], vectors: np.ndarray, wait: bool = True
+    ) -> None:
         """Insert or update document chunks with embeddings.
 
+        Embeddings are passed as one matrix alongside the chunks rather than
+        stored per chunk, so they never exist as Python float lists.
+
         Args:
             chunks: List of DocumentChunk objects to store
+            vectors: (len(chunks), embedding_dim) float32 array of embeddings
+            wait: Block until Qdrant has applied the update; pass False to
+                queue it and keep uploading (updates are applied in order)
         """
-        points: List[PointStruct] = []
-        for chunk in chunks:
-            point = PointStruct(
-                id=self._hash_to_id(chunk.chunk_id),
-                vector=chunk.embedding,
-                payload={
+        batch = Batch(
+            ids=[self._hash_to_id(chunk.chunk_id) for chunk in chunks],
+            vectors=vectors,
+            payloads=[
+                {
                     "chunk_id": chunk.chunk_id,
                     "text": chunk.text,
                     "metadata": chunk.metadata,
-                },
-            )
-            points.append(point)
+                }
+                for chunk in chunks
+            ],
+        )
 
-        self.client.upsert(collection_name=self.collection_name, points=points)
-        logger.debug(f"Upserted {len(points)} chunks")
+        self.client.upsert(
+            collection_name=self.collection_name, points=batch, wait=wait
+        )
+        logger.debug(f"Upserted {len(chunks)} chunks")
 
     def search(
-        self, query_embedding: List[float], top_k: int = 5
+        self, query_embedding: np.ndarray | List[float], top_k: int = 5
     ) -> List[DocumentChunk]:
         """Search for similar chunks using vector similarity.
 
         Args:
-            query_embedding: Query vector as list of floats
+            query_embedding: Query vector as a float32 array (or list of floats)
             top_k: Number of top results to return
 
         Returns:
@@ -79,19 +151,33 @@ class VectorStore:
             collection_name=self.collection_name,
             query=query_embedding,
             limit=top_k,
-            with_payload=True,
+            with_payload=_SEARCH_PAYLOAD,
+            search_params=self.search_params,
         ).points
 
-        return [
-            DocumentChunk(
-                chunk_id=str(r.payload.get("chunk_id", "")),
-                text=str(r.payload.get("text", "")),
-                score=float(r.score),
-                metadata=r.payload.get("metadata", {}),
+        return self._to_chunks(results)
+
+    def _to_chunks(self, results: List[ScoredPoint]) -> List[DocumentChunk]:
+        """Convert Qdrant search hits into DocumentChunk objects.
+
+        Payloads are written by upsert_chunks, so their fields already have
+        the right types and are passed through without conversion.
+        """
+        chunks = []
+        for r in results:
+            payload = r.payload
+            if payload is None:
+                continue
+            get = payload.get
+            chunks.append(
+                DocumentChunk(
+                    chunk_id=get("chunk_id", ""),
+                    text=get("text", ""),
+                    score=r.score,
+                    metadata=get("metadata", {}),
+                )
             )
-            for r in results
-            if r.payload is not None
-        ]
+        return chunks
 
     def _hash_to_id(self, chunk_id: str) -> int:
         """Convert string ID to integer for Qdrant.
@@ -102,9 +188,9 @@ class VectorStore:
         Returns:
             Integer ID suitable for Qdrant PointStruct
         """
-        hash_int = int(hashlib.md5(chunk_id.encode()).hexdigest()[:16], 16)
+        digest = hashlib.blake2b(chunk_id.encode(), digest_size=8).digest()
         # Ensure ID is a positive integer within int64 range
-        return hash_int % (2**62)
+        return int.from_bytes(digest, "little") & _POINT_ID_MASK
 
     def get_collection_size(self) -> int:
         """Get number of points in collection."""
@@ -113,3 +199,31 @@ class VectorStore:
             return info.points_count or 0
         except Exception:
             return 0
+
+
+def _quantization_config(quantization: str | None) -> QuantizationConfig | None:
+    """Build the collection quantization config for a QDRANT_QUANTIZATION value."""
+    if quantization is None:
+        return None
+    if quantization == "scalar":
+        return ScalarQuantization(
+            scalar=ScalarQuantizationConfig(
+                type=ScalarType.INT8, quantile=0.99, always_ram=True
+            )
+        )
+    if quantization == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+    raise ValueError(f"Unsupported Qdrant quantization: {quantization}")
+
+
+def _quantization_search_params(quantization: str | None) -> SearchParams | None:
+    """Search params that keep recall for a quantized collection.
+
+    Binary codes are too coarse on their own, so candidates are oversampled
+    and rescored with the original vectors. Scalar INT8 needs no overrides.
+    """
+    if quantization == "binary":
+        return SearchParams(
+            quantization=QuantizationSearchParams(rescore=True, oversampling=2.0)
+        )
+    return None
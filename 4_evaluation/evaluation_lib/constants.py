@@ -35,6 +35,21 @@ RAGAS_EMBEDDING_MODEL = "text-embedding-3-small"  # Same as retrieval
 RAGAS_BATCH_SIZE = 10  # Evaluate 10 queries at a time
 RAGAS_METRICS = ["context_precision", "faithfulness", "answer_relevancy"]
 
+# Operational query categories, in reporting order
+QUERY_CATEGORIES = (
+    "Clean Pass",
+    "Hallucination",
+    "Retrieval Failure",
+    "Irrelevant Answer",
+    "Total Failure",
+)
+
+# ROUGE-L is scored in worker processes once there are this many pairs per worker
+ROUGE_PARALLEL_MIN_PAIRS = 200
+
+# Seed for the bootstrap confidence intervals, so reported CIs are reproducible
+BOOTSTRAP_SEED = 42
+
 # Category thresholds (from research)
 CLEAN_PASS_THRESHOLD = 0.7
 HALLUCINATION_CP_THRESHOLD = 0.6
@@ -1,10 +1,15 @@
 # evaluation_lib/metrics_calculator.py
 
+import functools
 import logging
-from typing import List, Literal
+import operator
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Literal, Tuple
 
 import numpy as np
 
+from .constants import QUERY_CATEGORIES, ROUGE_PARALLEL_MIN_PAIRS
 from .models import (
     AccuracyLatencyTradeoff,
     CategoryBreakdown,
@@ -23,54 +28,98 @@ from .models import (
 
 logger = logging.getLogger(__name__)
 
+# Integer code of each query category, in QUERY_CATEGORIES order
+_CATEGORY_CODES = {name: code for code, name in enumerate(QUERY_CATEGORIES)}
+
+# Placeholder distribution for experiments without latency data (never mutated)
+_ZERO_DISTRIBUTION = DistributionStats(
+    mean=0.0,
+    std_dev=0.0,
+    variance=0.0,
+    min=0.0,
+    max=0.0,
+    median=0.0,
+    q1=0.0,
+    q3=0.0,
+    p5=0.0,
+    p95=0.0,
+    p99=0.0,
+    iqr=0.0,
+    mad=0.0,
+)
+
+
+def compute_distribution_stats(values: List[float] | np.ndarray) -> DistributionStats:
+    """Compute complete statistical distribution for a list of values.
+
+    All order statistics come from one sorted copy of the values.
+    """
+    sorted_values = np.sort(np.asarray(values, dtype=float))
 
-def compute_distribution_stats(values: List[float]) -> DistributionStats:
-    """Compute complete statistical distribution for a list of values."""
-    values_array = np.array(values)
+    p5, q1, median, q3, p95, p99 = np.quantile(
+        sorted_values, [0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+    )
+    variance = np.var(sorted_values, ddof=1)  # Sample variance
 
     return DistributionStats(
-        mean=float(np.mean(values_array)),
-        std_dev=float(np.std(values_array, ddof=1)),  # Sample standard deviation
-        variance=float(np.var(values_array, ddof=1)),
-        min=float(np.min(values_array)),
-        max=float(np.max(values_array)),
-        median=float(np.median(values_array)),
-        q1=float(np.percentile(values_array, 25)),
-        q3=float(np.percentile(values_array, 75)),
-        p5=float(np.percentile(values_array, 5)),
-        p95=float(np.percentile(values_array, 95)),
-        p99=float(np.percentile(values_array, 99)),
-        iqr=float(np.percentile(values_array, 75) - np.percentile(values_array, 25)),
-        mad=float(np.median(np.abs(values_array - np.median(values_array)))),
+        mean=float(np.mean(sorted_values)),
+        std_dev=float(np.sqrt(variance)),  # Sample standard deviation
+        variance=float(variance),
+        min=float(sorted_values[0]),
+        max=float(sorted_values[-1]),
+        median=float(median),
+        q1=float(q1),
+        q3=float(q3),
+        p5=float(p5),
+        p95=float(p95),
+        p99=float(p99),
+        iqr=float(q3 - q1),
+        mad=float(np.median(np.abs(sorted_values - median))),
     )
 
 
 def compute_confidence_interval_bootstrap(
-    values: List[float], n_bootstraps: int = 1000, confidence_level: float = 0.95
+    values: List[float] | np.ndarray,
+    n_bootstraps: int = 1000,
+    confidence_level: float = 0.95,
+    batch_size: int = 64,
+    seed: int | None = None,
 ) -> tuple[float, float]:
-    """Compute bootstrap confidence interval for the mean."""
-    values_array = np.array(values)
+    """Compute bootstrap confidence interval for the mean.
+
+    Resamples are drawn as (batch_size, n) index matrices and averaged in one
+    NumPy call per batch, which bounds memory for large n. Resamples come
+    from a generator seeded with `seed`, not from the global np.random state;
+    pass a seed to make the interval reproducible.
+    """
+    values_array = np.asarray(values, dtype=float)
     n = len(values_array)
 
     # Bootstrap resampling
-    bootstrap_means = []
-    for _ in range(n_bootstraps):
-        sample = np.random.choice(values_array, size=n, replace=True)
-        bootstrap_means.append(np.mean(sample))
+    rng = np.random.default_rng(seed)
+    bootstrap_means = np.empty(n_bootstraps)
+    for start in range(0, n_bootstraps, batch_size):
+        stop = min(start + batch_size, n_bootstraps)
+        idx = rng.integers(0, n, size=(stop - start, n))
+        bootstrap_means[start:stop] = values_array[idx].mean(axis=1)
 
     # Compute percentiles
     lower_percentile = (1 - confidence_level) / 2 * 100
     upper_percentile = (1 + confidence_level) / 2 * 100
 
-    ci_lower = float(np.percentile(bootstrap_means, lower_percentile))
-    ci_upper = float(np.percentile(bootstrap_means, upper_percentile))
+    ci_lower, ci_upper = np.percentile(
+        bootstrap_means, [lower_percentile, upper_percentile]
+    )
 
-    return ci_lower, ci_upper
+    return float(ci_lower), float(ci_upper)
 
 
-def compute_cohens_d(sample1: List[float], sample2: List[float]) -> float:
+def compute_cohens_d(
+    sample1: List[float] | np.ndarray, sample2: List[float] | np.ndarray
+) -> float:
     """Compute Cohen's d effect size between two samples."""
-    arr1, arr2 = np.array(sample1), np.array(sample2)
+    arr1 = np.asarray(sample1, dtype=float)
+    arr2 = np.asarray(sample2, dtype=float)
 
     n1, n2 = len(arr1), len(arr2)
     mean1, mean2 = np.mean(arr1), np.mean(arr2)
@@ -86,7 +135,10 @@ def compute_cohens_d(sample1: List[float], sample2: List[float]) -> float:
 
 
 def compute_cliffs_delta(sample1: List[float], sample2: List[float]) -> float:
-    """Compute Cliff's delta effect size (non-parametric)."""
+    """Compute Cliff's delta effect size (non-parametric).
+
+    Runs in O((n1 + n2) log n1) instead of comparing every pair.
+    """
     arr1, arr2 = np.array(sample1), np.array(sample2)
 
     n1, n2 = len(arr1), len(arr2)
@@ -95,15 +147,20 @@ def compute_cliffs_delta(sample1: List[float], sample2: List[float]) -> float:
     if total_pairs == 0:
         return 0.0
 
+    # Count pairs via binary search over the sorted first sample; ties fall
+    # between the left and right insertion points and count as neither
+    sorted1 = np.sort(arr1)
     # Count pairs where arr2 > arr1
-    greater_count = sum(1 for x in arr2 for y in arr1 if x > y)
+    greater_count = int(np.searchsorted(sorted1, arr2, side="left").sum())
     # Count pairs where arr2 < arr1
-    lesser_count = sum(1 for x in arr2 for y in arr1 if x < y)
+    lesser_count = int((n1 - np.searchsorted(sorted1, arr2, side="right")).sum())
 
     return float((greater_count - lesser_count) / total_pairs)
 
 
-def safe_corrcoef(x: List[float], y: List[float]) -> float | None:
+def safe_corrcoef(
+    x: List[float] | np.ndarray, y: List[float] | np.ndarray
+) -> float | None:
     """
     Safely compute Pearson correlation coefficient between two arrays.
 
@@ -112,102 +169,154 @@ def safe_corrcoef(x: List[float], y: List[float]) -> float | None:
     - Arrays with NaN or infinite values
     - Arrays with insufficient data
 
+    The coefficient is computed directly from the centered arrays, without
+    building the full correlation matrix; arrays are used without copying.
+
     Returns:
         Correlation coefficient between -1 and 1, or None if computation is invalid
     """
     if len(x) != len(y) or len(x) < 2:
         return None
 
-    arr_x = np.array(x)
-    arr_y = np.array(y)
+    return _correlate_centered(_center_for_correlation(x), _center_for_correlation(y))
+
+
+def _center_for_correlation(
+    values: List[float] | np.ndarray,
+) -> Tuple[np.ndarray, float] | None:
+    """Validate an array for correlation once and center it.
+
+    Returns the centered array with its sum of squares, or None if the array
+    holds NaN/infinite values or has zero variance (correlation undefined).
+    Centered arrays can be reused for every correlation they take part in.
+    """
+    arr = np.asarray(values, dtype=float)
 
     # Check for NaN or infinite values
-    if np.any(~np.isfinite(arr_x)) or np.any(~np.isfinite(arr_y)):
+    if not np.isfinite(arr).all():
         logger.warning("NaN or infinite values detected in correlation computation")
         return None
 
+    centered = arr - arr.mean()
+    sum_sq = float(centered @ centered)
+
     # Check for zero variance (all values are the same)
-    if np.std(arr_x) == 0.0 or np.std(arr_y) == 0.0:
-        # If both arrays are constant, correlation is undefined (return None)
-        # If only one is constant, correlation is also undefined
+    if sum_sq == 0.0:
         return None
 
+    return centered, sum_sq
+
+
+def _correlate_centered(
+    x: Tuple[np.ndarray, float] | None, y: Tuple[np.ndarray, float] | None
+) -> float | None:
+    """Pearson correlation of two arrays prepared by _center_for_correlation."""
+    if x is None or y is None:
+        return None
+    (centered_x, sum_sq_x), (centered_y, sum_sq_y) = x, y
+
     # Compute correlation safely
-    with np.errstate(invalid="raise", divide="raise"):
+    with np.errstate(invalid="raise", divide="raise", over="raise"):
         try:
-            corr_matrix = np.corrcoef(arr_x, arr_y)
-            corr_value = float(corr_matrix[0, 1])
+            corr_value = float(centered_x @ centered_y) / np.sqrt(sum_sq_x * sum_sq_y)
 
             # Validate result
             if not np.isfinite(corr_value):
                 return None
 
-            return corr_value
+            # Clip rounding error, as np.corrcoef does
+            return float(np.clip(corr_value, -1.0, 1.0))
         except (FloatingPointError, ValueError) as e:
             logger.warning(f"Error computing correlation: {e}")
             return None
 
 
-def compute_brier_score(faithfulness_scores: List[float]) -> float:
+def compute_brier_score(faithfulness_scores: List[float] | np.ndarray) -> float:
     """Compute Brier score for calibration assessment."""
     # For simplicity, use faithfulness as a proxy for correctness
     # In a real implementation, you'd need ground truth correctness labels
     # Brier score = mean((predicted - actual)^2)
     # Here we approximate using (faithfulness - 1)^2 as penalty for low faithfulness
-    scores_array = np.array(faithfulness_scores)
-    return float(np.mean((scores_array - 1.0) ** 2))
+    errors = 1.0 - np.asarray(faithfulness_scores, dtype=float)
+    # Sum of squares as one dot product, without a squared temporary
+    return float(errors @ errors / errors.size)
 
 
 def compute_f1_score(predictions: List[str], references: List[str]) -> float:
-    """Compute token-level F1 score between predictions and references."""
-    try:
-        from scipy.sparse import issparse
-        from sklearn.feature_extraction.text import CountVectorizer
-        from sklearn.metrics import f1_score
-
-        # Simple token-level F1 using bag-of-words with binary=True
-        vectorizer = CountVectorizer(
-            tokenizer=str.split,
-            token_pattern=None,  # important when supplying a tokenizer
-            lowercase=True,
-            binary=True,  # binarize at the vectorizer level
-        )
-        pred_vectors = vectorizer.fit_transform(predictions)
-        ref_vectors = vectorizer.transform(references)
+    """Compute token-level F1 score between predictions and references.
 
-        def to_dense_int(X):
-            X_dense = X.toarray() if issparse(X) else X
-            return np.asarray(X_dense, dtype=np.int8)
+    Each text is a set of lowercased whitespace tokens, and the F1 of a pair
+    is 2 * |pred & ref| / (|pred| + |ref|). As with the bag-of-words
+    vocabulary used previously, only reference tokens that occur in some
+    prediction are counted.
+    """
+    pred_tokens = [set(pred.lower().split()) for pred in predictions]
+    vocabulary = set().union(*pred_tokens)
+
+    f1_scores = []
+    for pred, ref in zip(pred_tokens, references):
+        ref_set = vocabulary.intersection(ref.lower().split())
+        if not ref_set:  # No tokens in reference
+            f1_scores.append(1.0 if not pred else 0.0)
+        else:
+            f1_scores.append(2 * len(pred & ref_set) / (len(pred) + len(ref_set)))
 
-        pred_binary = to_dense_int(pred_vectors)
-        ref_binary = to_dense_int(ref_vectors)
+    return float(np.mean(f1_scores))
 
-        # Compute F1 for each sample, then average
-        f1_scores = []
-        for pred, ref in zip(pred_binary, ref_binary):
-            if np.sum(ref) == 0:  # No tokens in reference
-                f1_scores.append(1.0 if np.sum(pred) == 0 else 0.0)
-            else:
-                f1_scores.append(f1_score(ref, pred))
 
-        return float(np.mean(f1_scores))
+@functools.lru_cache(maxsize=1)
+def _get_rouge_scorer():
+    """Return the shared ROUGE-L scorer (its Porter stemmer is built once)."""
+    from rouge_score import rouge_scorer
 
-    except ImportError:
-        logger.warning("sklearn not available, returning 0.0 for F1 score")
-        return 0.0
+    return rouge_scorer.RougeScorer(["rougeL"], use_stemmer=True)
 
 
-def compute_rouge_l(predictions: List[str], references: List[str]) -> float:
-    """Compute ROUGE-L F1 score."""
-    try:
-        from rouge_score import rouge_scorer
+@functools.lru_cache(maxsize=1)
+def _get_bleu():
+    """Return the shared sacrebleu BLEU metric (its tokenizer is built once)."""
+    import sacrebleu
+
+    return sacrebleu.BLEU()
+
 
-        scorer = rouge_scorer.RougeScorer(["rougeL"], use_stemmer=True)
-        scores = []
+def _rouge_l_fmeasures(predictions: List[str], references: List[str]) -> List[float]:
+    """ROUGE-L F1 of each prediction against its reference."""
+    scorer = _get_rouge_scorer()
+    return [
+        scorer.score(ref, pred)["rougeL"].fmeasure
+        for pred, ref in zip(predictions, references)
+    ]
+
+
+def compute_rouge_l(predictions: List[str], references: List[str]) -> float:
+    """Compute ROUGE-L F1 score.
 
-        for pred, ref in zip(predictions, references):
-            score = scorer.score(ref, pred)
-            scores.append(score["rougeL"].fmeasure)
+    Scoring is pure-Python and CPU-bound, so large inputs are split across
+    worker processes; below ROUGE_PARALLEL_MIN_PAIRS pairs the pool startup
+    would cost more than it saves.
+    """
+    try:
+        n_workers = min(
+            os.cpu_count() or 1, len(predictions) // ROUGE_PARALLEL_MIN_PAIRS
+        )
+        if n_workers <= 1:
+            scores = _rouge_l_fmeasures(predictions, references)
+        else:
+            # Check the import here rather than in every worker
+            _get_rouge_scorer()
+            chunk = -(-len(predictions) // n_workers)
+            bounds = range(0, len(predictions), chunk)
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                scores = [
+                    score
+                    for chunk_scores in executor.map(
+                        _rouge_l_fmeasures,
+                        [predictions[i : i + chunk] for i in bounds],
+                        [references[i : i + chunk] for i in bounds],
+                    )
+                    for score in chunk_scores
+                ]
 
         return float(np.mean(scores))
 
@@ -219,11 +328,11 @@ def compute_rouge_l(predictions: List[str], references: List[str]) -> float:
 def compute_bleu_score(predictions: List[str], references: List[str]) -> float | None:
     """Compute BLEU score."""
     try:
-        import sacrebleu
+        bleu_metric = _get_bleu()
 
         # Prepare references as list of lists for sacrebleu
         refs = [[ref] for ref in references]
-        bleu = sacrebleu.corpus_bleu(predictions, refs)
+        bleu = bleu_metric.corpus_score(predictions, refs)
         return float(bleu.score / 100.0)  # Convert to 0-1 scale
 
     except ImportError:
@@ -231,10 +340,16 @@ def compute_bleu_score(predictions: List[str], references: List[str]) -> float |
         return None
 
 
+def _percentage(mask: np.ndarray) -> float:
+    """Percentage of True entries in a boolean mask."""
+    return float(np.count_nonzero(mask) / mask.size * 100)
+
+
 def calculate_experiment_metrics(
     evaluation_results: List[QueryEvaluationResult],
     experiment: Literal["E1", "E2", "E3", "E4"],
     experiment_results: List[ExperimentResult],
+    bootstrap_seed: int | None = None,
 ) -> ExperimentMetrics:
     """
     Calculate comprehensive aggregated metrics for an experiment.
@@ -243,6 +358,7 @@ def calculate_experiment_metrics(
         evaluation_results: All query evaluations for this experiment
         experiment: "E1", "E2", "E3", or "E4"
         experiment_results: Original experiment results for latency/text data (optional)
+        bootstrap_seed: Seed for the bootstrap confidence interval (None: unseeded)
         baseline_metrics: E1 baseline metrics for comparison (optional)
 
     Returns:
@@ -253,24 +369,39 @@ def calculate_experiment_metrics(
 
     total_queries = len(evaluation_results)
 
-    # Extract arrays for calculations
-    context_precision_scores = [r.context_precision for r in evaluation_results]
-    faithfulness_scores = [r.faithfulness for r in evaluation_results]
-    answer_relevancy_scores = [r.answer_relevancy for r in evaluation_results]
-    geometric_mean_scores = [r.geometric_mean for r in evaluation_results]
-    hallucination_risk_scores = [r.hallucination_risk_index for r in evaluation_results]
+    # Extract arrays for calculations (converted once, shared by all helpers)
+    context_precision_scores = np.asarray(
+        [r.context_precision for r in evaluation_results], dtype=np.float64
+    )
+    faithfulness_scores = np.asarray(
+        [r.faithfulness for r in evaluation_results], dtype=np.float64
+    )
+    answer_relevancy_scores = np.asarray(
+        [r.answer_relevancy for r in evaluation_results], dtype=np.float64
+    )
+    geometric_mean_scores = np.asarray(
+        [r.geometric_mean for r in evaluation_results], dtype=np.float64
+    )
+    hallucination_risk_scores = np.asarray(
+        [r.hallucination_risk_index for r in evaluation_results], dtype=np.float64
+    )
 
     # Extract latency data if available
+    # (converted once, shared by distribution, correlation and category stats)
     if experiment_results:
-        retrieval_times = [r.retrieval_time_ms for r in experiment_results]
-        llm_times = [r.llm_time_ms for r in experiment_results]
-        total_times = [r.total_time_ms for r in experiment_results]
+        retrieval_times = np.asarray(
+            [r.retrieval_time_ms for r in experiment_results], dtype=np.float64
+        )
+        llm_times = np.asarray(
+            [r.llm_time_ms for r in experiment_results], dtype=np.float64
+        )
+        total_times = np.asarray(
+            [r.total_time_ms for r in experiment_results], dtype=np.float64
+        )
         predictions = [r.llm_answer for r in experiment_results]
         references = [r.ground_truth for r in experiment_results]
     else:
-        retrieval_times = []
-        llm_times = []
-        total_times = []
+        retrieval_times = llm_times = total_times = np.empty(0, dtype=np.float64)
         predictions = []
         references = []
 
@@ -281,7 +412,9 @@ def calculate_experiment_metrics(
     geometric_mean_dist = compute_distribution_stats(geometric_mean_scores)
 
     # === CATEGORY 2: STATISTICAL CONFIDENCE ===
-    ci_lower, ci_upper = compute_confidence_interval_bootstrap(geometric_mean_scores)
+    ci_lower, ci_upper = compute_confidence_interval_bootstrap(
+        geometric_mean_scores, seed=bootstrap_seed
+    )
     standard_error = geometric_mean_dist.std_dev / np.sqrt(total_queries)
 
     geometric_mean_confidence = StatisticalConfidence(
@@ -295,49 +428,30 @@ def calculate_experiment_metrics(
         is_significant_vs_baseline=None,
     )
 
+    # Hallucination severity buckets, shared by threshold and severity rates
+    hri_low = hallucination_risk_scores <= 0.1
+    hri_high = hallucination_risk_scores > 0.2
+    hri_medium = ~hri_low & ~hri_high
+
     # === CATEGORY 3: THRESHOLDED SUCCESS RATES ===
     threshold_metrics = ThresholdMetrics(
-        pct_context_precision_above_0_7=sum(
-            1 for x in context_precision_scores if x >= 0.7
-        )
-        / total_queries
-        * 100,
-        pct_faithfulness_above_0_8=sum(1 for x in faithfulness_scores if x >= 0.8)
-        / total_queries
-        * 100,
-        pct_answer_relevancy_above_0_7=sum(
-            1 for x in answer_relevancy_scores if x >= 0.7
-        )
-        / total_queries
-        * 100,
-        pct_geometric_mean_above_0_7=sum(1 for x in geometric_mean_scores if x >= 0.7)
-        / total_queries
-        * 100,
-        pct_hri_below_0_1=sum(1 for x in hallucination_risk_scores if x <= 0.1)
-        / total_queries
-        * 100,
-        pct_partial_success=sum(
-            1
-            for cp, f, ar in zip(
-                context_precision_scores, faithfulness_scores, answer_relevancy_scores
-            )
-            if cp >= 0.7 or f >= 0.8 or ar >= 0.7
-        )
-        / total_queries
-        * 100,
+        pct_context_precision_above_0_7=_percentage(context_precision_scores >= 0.7),
+        pct_faithfulness_above_0_8=_percentage(faithfulness_scores >= 0.8),
+        pct_answer_relevancy_above_0_7=_percentage(answer_relevancy_scores >= 0.7),
+        pct_geometric_mean_above_0_7=_percentage(geometric_mean_scores >= 0.7),
+        pct_hri_below_0_1=_percentage(hri_low),
+        pct_partial_success=_percentage(
+            (context_precision_scores >= 0.7)
+            | (faithfulness_scores >= 0.8)
+            | (answer_relevancy_scores >= 0.7)
+        ),
     )
 
     # === CATEGORY 4: IR QUALITY DIAGNOSTICS ===
     ir_metrics = IRMetrics(
-        retrieval_success_rate=sum(1 for x in context_precision_scores if x > 0.5)
-        / total_queries
-        * 100,
-        high_quality_retrieval_rate=sum(1 for x in context_precision_scores if x >= 0.7)
-        / total_queries
-        * 100,
-        retrieval_coverage=sum(1 for x in context_precision_scores if x > 0.0)
-        / total_queries
-        * 100,
+        retrieval_success_rate=_percentage(context_precision_scores > 0.5),
+        high_quality_retrieval_rate=_percentage(context_precision_scores >= 0.7),
+        retrieval_coverage=_percentage(context_precision_scores > 0.0),
         mean_context_recall_proxy=context_precision_dist.mean,  # CP serves as recall proxy
     )
 
@@ -345,10 +459,13 @@ def calculate_experiment_metrics(
     generation_quality = None
     if predictions and references:
         generation_quality = GenerationQualityMetrics(
+            # Compare stripped strings pairwise in C, without a Python loop
             exact_match_rate=sum(
-                1
-                for pred, ref in zip(predictions, references)
-                if pred.strip() == ref.strip()
+                map(
+                    operator.eq,
+                    map(str.strip, predictions),
+                    map(str.strip, references),
+                )
             )
             / total_queries
             * 100,
@@ -360,20 +477,14 @@ def calculate_experiment_metrics(
     # === CATEGORY 6: HALLUCINATION ANALYSIS ===
     hallucination_analysis = HallucinationAnalysis(
         brier_score=compute_brier_score(faithfulness_scores),
-        severity_high_pct=sum(1 for x in hallucination_risk_scores if x > 0.2)
-        / total_queries
-        * 100,
-        severity_medium_pct=sum(1 for x in hallucination_risk_scores if 0.1 < x <= 0.2)
-        / total_queries
-        * 100,
-        severity_low_pct=sum(1 for x in hallucination_risk_scores if x <= 0.1)
-        / total_queries
-        * 100,
+        severity_high_pct=_percentage(hri_high),
+        severity_medium_pct=_percentage(hri_medium),
+        severity_low_pct=_percentage(hri_low),
         hri_distribution=compute_distribution_stats(hallucination_risk_scores),
     )
 
     # === CATEGORY 7: LATENCY & COST ===
-    if retrieval_times and llm_times and total_times:
+    if total_times.size:
         latency_metrics = LatencyMetrics(
             retrieval=compute_distribution_stats(retrieval_times),
             llm=compute_distribution_stats(llm_times),
@@ -387,90 +498,73 @@ def calculate_experiment_metrics(
     else:
         # Placeholder when no latency data available
         latency_metrics = LatencyMetrics(
-            retrieval=DistributionStats(
-                mean=0.0,
-                std_dev=0.0,
-                variance=0.0,
-                min=0.0,
-                max=0.0,
-                median=0.0,
-                q1=0.0,
-                q3=0.0,
-                p5=0.0,
-                p95=0.0,
-                p99=0.0,
-                iqr=0.0,
-                mad=0.0,
-            ),
-            llm=DistributionStats(
-                mean=0.0,
-                std_dev=0.0,
-                variance=0.0,
-                min=0.0,
-                max=0.0,
-                median=0.0,
-                q1=0.0,
-                q3=0.0,
-                p5=0.0,
-                p95=0.0,
-                p99=0.0,
-                iqr=0.0,
-                mad=0.0,
-            ),
-            total=DistributionStats(
-                mean=0.0,
-                std_dev=0.0,
-                variance=0.0,
-                min=0.0,
-                max=0.0,
-                median=0.0,
-                q1=0.0,
-                q3=0.0,
-                p5=0.0,
-                p95=0.0,
-                p99=0.0,
-                iqr=0.0,
-                mad=0.0,
-            ),
+            retrieval=_ZERO_DISTRIBUTION,
+            llm=_ZERO_DISTRIBUTION,
+            total=_ZERO_DISTRIBUTION,
         )
 
     # === CATEGORY 8: CORRELATIONS ===
+    # Validate and center each score array once, shared across correlations
+    cp_centered = _center_for_correlation(context_precision_scores)
+    f_centered = _center_for_correlation(faithfulness_scores)
+    ar_centered = _center_for_correlation(answer_relevancy_scores)
+    gmean_centered = _center_for_correlation(geometric_mean_scores)
     correlation_analysis = CorrelationAnalysis(
-        cp_vs_ar=safe_corrcoef(context_precision_scores, answer_relevancy_scores),
-        cp_vs_gmean=safe_corrcoef(context_precision_scores, geometric_mean_scores),
-        f_vs_ar=safe_corrcoef(faithfulness_scores, answer_relevancy_scores),
+        cp_vs_ar=_correlate_centered(cp_centered, ar_centered),
+        cp_vs_gmean=_correlate_centered(cp_centered, gmean_centered),
+        f_vs_ar=_correlate_centered(f_centered, ar_centered),
         latency_vs_gmean=(
-            safe_corrcoef(total_times, geometric_mean_scores) if total_times else None
+            safe_corrcoef(total_times, geometric_mean_scores)
+            if total_times.size
+            else None
         ),
         context_len_vs_hri=None,  # Would need context length data
     )
 
     # === CATEGORY 9: QUERY CATEGORY BREAKDOWN ===
-    categories = [r.category for r in evaluation_results]
-    category_counts = {
-        "Clean Pass": categories.count("Clean Pass"),
-        "Hallucination": categories.count("Hallucination"),
-        "Retrieval Failure": categories.count("Retrieval Failure"),
-        "Irrelevant Answer": categories.count("Irrelevant Answer"),
-        "Total Failure": categories.count("Total Failure"),
-    }
+    # Group by integer category codes: one pass per statistic, not per category
+    category_codes = np.fromiter(
+        (_CATEGORY_CODES[r.category] for r in evaluation_results),
+        dtype=np.intp,
+        count=total_queries,
+    )
+    n_categories = len(QUERY_CATEGORIES)
+    category_counts = np.bincount(category_codes, minlength=n_categories)
+    counts_nonzero = np.maximum(category_counts, 1)
+    cat_mean_gmeans = (
+        np.bincount(
+            category_codes, weights=geometric_mean_scores, minlength=n_categories
+        )
+        / counts_nonzero
+    )
+    cat_mean_hris = (
+        np.bincount(
+            category_codes, weights=hallucination_risk_scores, minlength=n_categories
+        )
+        / counts_nonzero
+    )
+    cat_mean_latencies = (
+        np.bincount(
+            category_codes,
+            weights=total_times[:total_queries],
+            minlength=n_categories,
+        )
+        / counts_nonzero
+        if total_times.size
+        else None
+    )
 
     category_breakdown = {}
-    for cat_name, count in category_counts.items():
+    for code, cat_name in enumerate(QUERY_CATEGORIES):
+        count = int(category_counts[code])
         if count > 0:
-            # Get metrics for queries in this category
-            cat_indices = [i for i, c in enumerate(categories) if c == cat_name]
-            cat_gmeans = [geometric_mean_scores[i] for i in cat_indices]
-            cat_hris = [hallucination_risk_scores[i] for i in cat_indices]
-            cat_latencies = [total_times[i] for i in cat_indices] if total_times else []
-
             category_breakdown[cat_name] = CategoryBreakdown(
                 count=count,
                 percentage=count / total_queries * 100,
-                mean_gmean=float(np.mean(cat_gmeans)),
-                mean_hri=float(np.mean(cat_hris)),
-                mean_latency_ms=float(np.mean(cat_latencies))
-                if cat_latencies
+                mean_gmean=float(cat_mean_gmeans[code]),
+                mean_hri=float(cat_mean_hris[code]),
+                mean_latency_ms=float(cat_mean_latencies[code])
+                if cat_mean_latencies is not None
                 else None,
             )
 
@@ -571,32 +665,21 @@ def calculate_pareto_optimality(
     Args:
         metrics_list: List of all ExperimentMetrics (E1-E4) - modified in place
     """
-    for i, metrics_i in enumerate(metrics_list):
-        is_dominated = False
-
-        for j, metrics_j in enumerate(metrics_list):
-            if i == j:
-                continue
-
-            # Check if metrics_j dominates metrics_i
-            better_quality = (
-                metrics_j.geometric_mean.mean >= metrics_i.geometric_mean.mean
-            )
-            better_time = (
-                metrics_j.latency_metrics.total.mean
-                <= metrics_i.latency_metrics.total.mean
-            )
-            at_least_one_strict = (
-                metrics_j.geometric_mean.mean > metrics_i.geometric_mean.mean
-                or metrics_j.latency_metrics.total.mean
-                < metrics_i.latency_metrics.total.mean
-            )
-
-            if better_quality and better_time and at_least_one_strict:
-                is_dominated = True
-                break
+    gmeans = np.array([m.geometric_mean.mean for m in metrics_list])
+    times = np.array([m.latency_metrics.total.mean for m in metrics_list])
+
+    # dominates[j, i]: experiment j has better/equal quality and speed than i,
+    # strictly better in at least one (never true for j == i)
+    better_quality = gmeans[:, None] >= gmeans[None, :]
+    better_time = times[:, None] <= times[None, :]
+    at_least_one_strict = (gmeans[:, None] > gmeans[None, :]) | (
+        times[:, None] < times[None, :]
+    )
+    dominates = better_quality & better_time & at_least_one_strict
+    is_dominated = dominates.any(axis=0)
 
-        metrics_i.accuracy_latency_tradeoff.is_pareto_optimal = not is_dominated
+    for metrics, dominated in zip(metrics_list, is_dominated):
+        metrics.accuracy_latency_tradeoff.is_pareto_optimal = not dominated
 
     # Log Pareto optimal experiments
     pareto_experiments = [
@@ -2,11 +2,13 @@
 
 import logging
 from pathlib import Path
-from typing import List, Literal
+from typing import List, Literal, Tuple
 
+from pydantic import TypeAdapter, ValidationError
 from tqdm import tqdm
 
 from .constants import (
+    BOOTSTRAP_SEED,
     DATA_FOLDER,
     E1_EVAL_OUTPUT,
     E1_INPUT_FILE,
@@ -28,17 +30,18 @@ from .metrics_calculator import (
     calculate_pareto_optimality,
     update_accuracy_gain_vs_baseline,
 )
-from .models import QueryEvaluationResult
+from .models import ExperimentResult, QueryEvaluationResult
 from .ragas_evaluator import evaluate_batch
 from .utils import (
-    load_existing_evaluation_results,
     load_experiment_with_contexts,
-    save_evaluation_result,
+    save_evaluation_results,
     save_metrics,
 )
 
 logger = logging.getLogger(__name__)
 
+_EVALUATION_RESULTS_ADAPTER = TypeAdapter(List[QueryEvaluationResult])
+
 
 def run_evaluation_pipeline(
     kb_dir: Path,
@@ -46,6 +49,7 @@ def run_evaluation_pipeline(
     embedding_model: str = RAGAS_EMBEDDING_MODEL,
     overwrite: bool = False,
     dry_run: bool = False,
+    bootstrap_seed: int | None = BOOTSTRAP_SEED,
 ) -> None:
     """
     Main evaluation pipeline for E1-E4 experiments.
@@ -57,9 +61,8 @@ def run_evaluation_pipeline(
        c. Evaluate queries using RAGAS (batch processing)
        d. Save QueryEvaluationResult to KB_DIR/eval/e{1-4}_evaluation.jsonl
        e. Calculate ExperimentMetrics
-       f. Save ExperimentMetrics to KB_DIR/eval/e{1-4}_metrics.json
     2. Calculate cross-experiment metrics (Pareto optimality, accuracy gain per ms)
-    3. Update metrics JSONs with final calculations
+    3. Save ExperimentMetrics to KB_DIR/eval/e{1-4}_metrics.json
 
     Args:
         kb_dir: Knowledge base directory
@@ -67,6 +70,7 @@ def run_evaluation_pipeline(
         embedding_model: Embedding model for RAGAS evaluation
         overwrite: Whether to overwrite existing evaluation results
         dry_run: Skip API calls and use mock scores
+        bootstrap_seed: Seed for the bootstrap confidence intervals (None: unseeded)
     """
     data_dir = kb_dir / DATA_FOLDER
     eval_dir = kb_dir / "eval"
@@ -80,6 +84,7 @@ def run_evaluation_pipeline(
     ]
 
     all_metrics = []
+    metrics_paths = {}
 
     logger.info("=" * 80)
     logger.info("Starting E1-E4 Evaluation Pipeline")
@@ -94,113 +99,32 @@ def run_evaluation_pipeline(
         for experiment, input_file, eval_output, metrics_output in experiments:
             exp_pbar.set_description(f"Processing {experiment}")
             exp_pbar.set_postfix(experiment=experiment)
-            logger.info(f"Processing {experiment}")
-
-            # Define file paths
-            input_path = data_dir / input_file
-            eval_output_path = eval_dir / eval_output
-            metrics_output_path = eval_dir / metrics_output
+            metrics_paths[experiment] = eval_dir / metrics_output
 
             try:
-                # Load experiment results with contexts
-                logger.info(f"Loading {experiment} results from {input_path}")
-                experiment_results, contexts_list = load_experiment_with_contexts(
-                    input_path, experiment
-                )
-
-                if not experiment_results:
-                    logger.warning(f"No results found for {experiment}, skipping")
-                    exp_pbar.update(1)
-                    continue
-
-                logger.info(
-                    f"Loaded {len(experiment_results)} queries for {experiment}"
+                evaluated = _evaluate_experiment(
+                    experiment=experiment,
+                    input_path=data_dir / input_file,
+                    eval_output_path=eval_dir / eval_output,
+                    llm_model=llm_model,
+                    embedding_model=embedding_model,
+                    overwrite=overwrite,
+                    dry_run=dry_run,
                 )
-
-                # Check for existing evaluation results (resume functionality)
-                processed_query_ids = set()
-                if not overwrite:
-                    processed_query_ids = load_existing_evaluation_results(
-                        eval_output_path
-                    )
-                    if processed_query_ids:
-                        logger.info(
-                            f"Found {len(processed_query_ids)} existing evaluations for {experiment}, resuming"
+                if evaluated is not None:
+                    all_evaluation_results, experiment_results = evaluated
+                    # Metrics are saved once cross-experiment fields are filled in
+                    all_metrics.append(
+                        calculate_experiment_metrics(
+                            all_evaluation_results,
+                            experiment,
+                            experiment_results,
+                            bootstrap_seed=bootstrap_seed,
                         )
-
-                # Filter out already processed queries
-                queries_to_evaluate = []
-                contexts_to_evaluate = []
-
-                for result, contexts in zip(experiment_results, contexts_list):
-                    if result.query_id not in processed_query_ids:
-                        queries_to_evaluate.append(result)
-                        contexts_to_evaluate.append(contexts)
-
-                if not queries_to_evaluate:
-                    logger.info(
-                        f"All {experiment} queries already evaluated, skipping evaluation"
-                    )
-                else:
-                    logger.info(
-                        f"Evaluating {len(queries_to_evaluate)} new queries for {experiment}"
                     )
-
-                    # Evaluate queries in batches with progress tracking
-                    with tqdm(
-                        total=len(queries_to_evaluate),
-                        desc=f"Evaluating {experiment} queries",
-                        leave=False,
-                    ) as query_pbar:
-                        batch_size = 10  # Process in smaller batches for better progress tracking
-                        for i in range(0, len(queries_to_evaluate), batch_size):
-                            batch_end = min(i + batch_size, len(queries_to_evaluate))
-                            batch_queries = queries_to_evaluate[i:batch_end]
-                            batch_contexts = contexts_to_evaluate[i:batch_end]
-
-                            # Evaluate batch
-                            batch_results = evaluate_batch(
-                                batch_queries,
-                                batch_contexts,
-                                llm_model,
-                                embedding_model,
-                                dry_run=dry_run,
-                            )
-
-                            # Save results immediately
-                            for eval_result in batch_results:
-                                save_evaluation_result(eval_result, eval_output_path)
-                                query_pbar.set_postfix(query_id=eval_result.query_id)
-
-                            query_pbar.update(len(batch_results))
-
                     logger.info(
-                        f"Saved {len(queries_to_evaluate)} evaluation results for {experiment}"
+                        f"Completed {experiment} evaluation and metrics calculation"
                     )
-
-                # Load all evaluation results for metrics calculation
-                # Note: We need to reload because we might have resumed from existing results
-                all_evaluation_results = _load_all_evaluation_results(eval_output_path)
-                if not all_evaluation_results:
-                    logger.warning(
-                        f"No evaluation results found for {experiment} metrics calculation, skipping"
-                    )
-                    exp_pbar.update(1)
-                    continue
-
-                # Calculate experiment metrics
-                metrics = calculate_experiment_metrics(
-                    all_evaluation_results, experiment, experiment_results
-                )
-
-                # Save metrics
-                save_metrics(metrics, metrics_output_path)
-                all_metrics.append(metrics)
-
-                logger.info(
-                    f"Completed {experiment} evaluation and metrics calculation"
-                )
-
             except Exception as e:
                 logger.error(f"Failed to process {experiment}: {e}")
                 raise
@@ -217,11 +141,9 @@ def run_evaluation_pipeline(
         # Calculate Pareto optimality
         calculate_pareto_optimality(all_metrics)
 
-        # Update metrics files with final calculations
+        # Save metrics files with final calculations
         for metrics in all_metrics:
-            experiment = metrics.experiment
-            metrics_output = eval_dir / f"{experiment.lower()}_metrics.json"
-            save_metrics(metrics, metrics_output)
+            save_metrics(metrics, metrics_paths[metrics.experiment])
 
         logger.info("Cross-experiment analysis completed")
 
@@ -231,9 +153,114 @@ def run_evaluation_pipeline(
     logger.info("=" * 80)
 
 
+def _evaluate_experiment(
+    experiment: Literal["E1", "E2", "E3", "E4"],
+    input_path: Path,
+    eval_output_path: Path,
+    llm_model: str,
+    embedding_model: str,
+    overwrite: bool,
+    dry_run: bool,
+) -> Tuple[List[QueryEvaluationResult], List[ExperimentResult]] | None:
+    """
+    Evaluate a single experiment with RAGAS (steps 1a-1d of the pipeline).
+
+    Returns:
+        All evaluation results (resumed and new) and the experiment results,
+        or None if there is nothing to calculate metrics from
+    """
+    logger.info(f"Processing {experiment}")
+
+    # Load experiment results with contexts
+    logger.info(f"Loading {experiment} results from {input_path}")
+    experiment_results, contexts_list = load_experiment_with_contexts(
+        input_path, experiment
+    )
+
+    if not experiment_results:
+        logger.warning(f"No results found for {experiment}, skipping")
+        return None
+
+    logger.info(f"Loaded {len(experiment_results)} queries for {experiment}")
+
+    # Load existing evaluation results (resume functionality);
+    # they are kept in memory and extended with new results below
+    all_evaluation_results: List[QueryEvaluationResult] = []
+    if overwrite:
+        if eval_output_path.exists():
+            logger.warning(
+                f"Overwrite enabled, removing existing {experiment} evaluation results: {eval_output_path}"
+            )
+            eval_output_path.unlink(missing_ok=True)
+    else:
+        all_evaluation_results = _load_all_evaluation_results(eval_output_path)
+        if all_evaluation_results:
+            logger.info(
+                f"Found {len(all_evaluation_results)} existing evaluations for {experiment}, resuming"
+            )
+    processed_query_ids = {r.query_id for r in all_evaluation_results}
+
+    # Filter out already processed queries
+    queries_to_evaluate = []
+    contexts_to_evaluate = []
+
+    for result, contexts in zip(experiment_results, contexts_list):
+        if result.query_id not in processed_query_ids:
+            queries_to_evaluate.append(result)
+            contexts_to_evaluate.append(contexts)
+
+    if not queries_to_evaluate:
+        logger.info(f"All {experiment} queries already evaluated, skipping evaluation")
+    else:
+        logger.info(
+            f"Evaluating {len(queries_to_evaluate)} new queries for {experiment}"
+        )
+
+        # Evaluate queries in batches with progress tracking
+        with tqdm(
+            total=len(queries_to_evaluate),
+            desc=f"Evaluating {experiment} queries",
+            leave=False,
+        ) as query_pbar:
+            batch_size = 10  # Process in smaller batches for better progress tracking
+            for i in range(0, len(queries_to_evaluate), batch_size):
+                batch_end = min(i + batch_size, len(queries_to_evaluate))
+                batch_queries = queries_to_evaluate[i:batch_end]
+                batch_contexts = contexts_to_evaluate[i:batch_end]
+
+                # Evaluate batch
+                batch_results = evaluate_batch(
+                    batch_queries,
+                    batch_contexts,
+                    llm_model,
+                    embedding_model,
+                    dry_run=dry_run,
+                )
+
+                # Save results immediately, one write per batch
+                save_evaluation_results(batch_results, eval_output_path)
+                all_evaluation_results.extend(batch_results)
+                if batch_results:
+                    query_pbar.set_postfix(query_id=batch_results[-1].query_id)
+
+                query_pbar.update(len(batch_results))
+
+        logger.info(
+            f"Saved {len(queries_to_evaluate)} evaluation results for {experiment}"
+        )
+
+    if not all_evaluation_results:
+        logger.warning(
+            f"No evaluation results found for {experiment} metrics calculation, skipping"
+        )
+        return None
+
+    return all_evaluation_results, experiment_results
+
+
 def _load_all_evaluation_results(
     eval_output_path: Path,
-) -> List["QueryEvaluationResult"]:
+) -> List[QueryEvaluationResult]:
     """
     Load all evaluation results from a JSONL file.
 
@@ -242,26 +269,16 @@ def _load_all_evaluation_results(
     if not eval_output_path.exists():
         return []
 
-    results = []
     try:
-        with open(eval_output_path, "r", encoding="utf-8") as f:
-            for line_num, line in enumerate(f, 1):
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    # Import here to avoid circular imports
-                    from .models import QueryEvaluationResult
-
-                    result = QueryEvaluationResult.model_validate_json(line)
-                    results.append(result)
-                except Exception as e:
-                    logger.error(
-                        f"Invalid evaluation result at line {line_num} in {eval_output_path}: {e}"
-                    )
-                    raise
+        # Single read; bytes.splitlines does the line splitting in C
+        data = eval_output_path.read_bytes()
+        lines = [line for line in data.splitlines() if line.strip()]
+        # One validate_json call over a JSON array instead of one per line
+        return _EVALUATION_RESULTS_ADAPTER.validate_json(b"[" + b",".join(lines) + b"]")
+    except ValidationError as e:
+        # Error locations start with the index of the offending record
+        logger.error(f"Invalid evaluation result in {eval_output_path}: {e}")
+        raise
     except Exception as e:
         logger.error(f"Error reading evaluation results from {eval_output_path}: {e}")
         raise
-
-    return results
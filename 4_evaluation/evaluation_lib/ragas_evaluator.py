@@ -42,9 +42,10 @@ def evaluate_single_query(
         cp = np.random.uniform(0.5, 0.9)
         f = np.random.uniform(0.5, 0.9)
         ar = np.random.uniform(0.5, 0.9)
-        logger.debug(
-            f"DRY_RUN: Mock scores for {experiment_result.query_id}: CP={cp:.3f}, F={f:.3f}, AR={ar:.3f}"
-        )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                f"DRY_RUN: Mock scores for {experiment_result.query_id}: CP={cp:.3f}, F={f:.3f}, AR={ar:.3f}"
+            )
     else:
         # Real RAGAS evaluation
         scores = _evaluate_with_ragas(
@@ -76,9 +77,10 @@ def evaluate_single_query(
         category=category,
     )
 
-    logger.debug(
-        f"Evaluated {experiment_result.query_id}: {category} (GMean={geometric_mean:.3f})"
-    )
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            f"Evaluated {experiment_result.query_id}: {category} (GMean={geometric_mean:.3f})"
+        )
 
     return evaluation_result
 
@@ -263,27 +265,25 @@ def _evaluate_batch_with_ragas(
         # Extract scores using to_pandas() method
         df = results.to_pandas()
 
+        # Extract all scores at once; NaN (failed metric) becomes 0.0 (worst score)
+        scores = df[["context_precision", "faithfulness", "answer_relevancy"]].to_numpy(
+            dtype=np.float64
+        )
+        scores[np.isnan(scores)] = 0.0
+
+        # Compute derived metrics for the whole batch
+        cps, fs, ars = scores.T
+        geometric_means = np.cbrt(cps * fs * ars)
+        hallucination_risk_indices = (1 - fs) * ars
+
         # Process results
         batch_evaluation_results = []
-        for i, result in enumerate(batch_results):
-            # Extract scores (handle potential NaN values)
-            cp = float(df["context_precision"].iloc[i])
-            f = float(df["faithfulness"].iloc[i])
-            ar = float(df["answer_relevancy"].iloc[i])
-
-            # Handle NaN values by replacing with 0.0 (worst score)
-            if np.isnan(cp):
-                cp = 0.0
-            if np.isnan(f):
-                f = 0.0
-            if np.isnan(ar):
-                ar = 0.0
-
-            # Compute derived metrics
-            geometric_mean = (cp * f * ar) ** (1 / 3)
-            hallucination_risk_index = (1 - f) * ar
-            category = categorize_query(cp, f, ar)
-
+        for result, (cp, f, ar), geometric_mean, hallucination_risk_index in zip(
+            batch_results,
+            scores.tolist(),
+            geometric_means.tolist(),
+            hallucination_risk_indices.tolist(),
+        ):
             evaluation_result = QueryEvaluationResult(
                 query_id=result.query_id,
                 experiment=result.experiment,
@@ -292,7 +292,7 @@ def _evaluate_batch_with_ragas(
                 answer_relevancy=ar,
                 geometric_mean=geometric_mean,
                 hallucination_risk_index=hallucination_risk_index,
-                category=category,
+                category=categorize_query(cp, f, ar),
             )
 
             batch_evaluation_results.append(evaluation_result)
@@ -3,7 +3,7 @@
 import json
 import logging
 from pathlib import Path
-from typing import List, Literal, Set, Tuple
+from typing import List, Literal, Tuple
 
 from .models import ExperimentMetrics, ExperimentResult, QueryEvaluationResult
 
@@ -82,54 +82,26 @@ def load_experiment_with_contexts(
     return minimal_results, contexts
 
 
-def load_existing_evaluation_results(output_file: Path) -> Set[str]:
+def save_evaluation_results(
+    results: List[QueryEvaluationResult], output_file: Path
+) -> None:
     """
-    Load set of already processed query_ids from evaluation output file.
-
-    Returns set of query_ids that have already been evaluated.
-    """
-    if not output_file.exists():
-        return set()
-
-    processed_query_ids = set()
-    try:
-        with open(output_file, "r", encoding="utf-8") as f:
-            for line_num, line in enumerate(f, 1):
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    result = json.loads(line)
-                    processed_query_ids.add(result["query_id"])
-                except json.JSONDecodeError as e:
-                    logger.error(
-                        f"Invalid JSON at line {line_num} in {output_file}: {e}"
-                    )
-                    raise
-    except Exception as e:
-        logger.error(f"Error reading existing results from {output_file}: {e}")
-        raise
-
-    logger.info(
-        f"Found {len(processed_query_ids)} already processed queries in {output_file}"
-    )
-    return processed_query_ids
-
-
-def save_evaluation_result(result: QueryEvaluationResult, output_file: Path) -> None:
-    """
-    Save a single QueryEvaluationResult to JSONL file (append mode).
+    Append a batch of QueryEvaluationResults to JSONL file.
+    The batch is written with a single open/write call.
     Creates parent directories if needed.
     """
+    if not results:
+        return
+
     output_file.parent.mkdir(parents=True, exist_ok=True)
 
+    lines = [
+        json.dumps(result.model_dump(), ensure_ascii=False) + "\n" for result in results
+    ]
     with open(output_file, "a", encoding="utf-8") as f:
-        json.dump(result.model_dump(), f, ensure_ascii=False)
-        f.write("\n")
+        f.write("".join(lines))
 
-    logger.debug(
-        f"Saved evaluation result for query_id={result.query_id} to {output_file}"
-    )
+    logger.debug(f"Saved {len(results)} evaluation results to {output_file}")
 
 
 def save_metrics(metrics: ExperimentMetrics, output_file: Path) -> None: